@@ -1,52 +1,79 @@
 import dash
+import argparse
+import gc
 import json
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, ctx, Input, Output, State, Patch, dash_table
 import dash_bootstrap_components as dbc
+from flask import request
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+import math
 import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+
+# Delad kod för kolumnfilerna ligger i model/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "model"))
+from fleet_store import compact_frame, load_fleet, store_path
+from process_utils import PerProcessThread
+from score_service import PARTICULARS, ScoringService, normalize_particulars
+
+# Kompakt läge: kategoriska Type/Flag, int32/float32-kolumner (sätt SHADOW_FLEET_COMPACT=0 för att stänga av)
+COMPACT_MODE = os.environ.get("SHADOW_FLEET_COMPACT", "1") != "0"
 
 # --- 1. DATA PREP ---
+SCORE_FILE = "vessels_with_score.csv"
+METRICS_FILE = "model_metrics.json"
 
-try:
-    with open("model_metrics.json", "r") as f:
-        metrics = json.load(f)
-        sensitivity_score = metrics.get("sensitivity", 0)
-        oob_score = metrics.get("oob_score", 0)
-        feature_data = pd.DataFrame(metrics.get("feature_importance", {}))
-except FileNotFoundError:
-    sensitivity_score = 0.0  # Default if file is missing
-    oob_score = 0.0  # Default if file is missing
-    feature_data = pd.DataFrame(
-        {
-            "Variable": [
-                "Age (Built)",
-                "Flag",
-                "Gross Tonnage (GT)",
-                "Vessel Type",
-                "DWT",
-                "Length/Width",
-            ],
-            "Importance": [0.35, 0.30, 0.15, 0.10, 0.08, 0.02],
+
+def load_metrics():
+    """Modellens nyckeltal från first_sort.py (standardvärden om filen saknas)."""
+    try:
+        with open(METRICS_FILE, "r") as f:
+            metrics = json.load(f)
+        return {
+            "sensitivity": metrics.get("sensitivity", 0),
+            "oob_score": metrics.get("oob_score", 0),
+            "feature_data": pd.DataFrame(metrics.get("feature_importance", {})),
+        }
+    except FileNotFoundError:
+        return {
+            "sensitivity": 0.0,  # Default if file is missing
+            "oob_score": 0.0,  # Default if file is missing
+            "feature_data": pd.DataFrame(
+                {
+                    "feature": [
+                        "Age (Built)",
+                        "Flag",
+                        "Gross Tonnage (GT)",
+                        "Vessel Type",
+                        "DWT",
+                        "Length/Width",
+                    ],
+                    "importance": [0.35, 0.30, 0.15, 0.10, 0.08, 0.02],
+                }
+            ),
         }
-    )
 
-try:
-    df = pd.read_csv("vessels_with_score.csv")
 
-    # Beräkna ålder
-    if "Built" in df.columns:
+def load_vessels(score_file=SCORE_FILE):
+    """Läser och förbereder de poängsatta fartygen. Kastar FileNotFoundError om de saknas."""
+    # Läser vessels_with_score.arrow (memory-mappad) om pipelinen skrivit den, annars CSV:n
+    df = load_fleet(score_file)
+
+    # Beräkna ålder (finns redan i kolumnfilen)
+    if "Age" not in df.columns and "Built" in df.columns:
         df["Age"] = 2025 - pd.to_numeric(df["Built"], errors="coerce").fillna(2025)
 
-    # Fixa IMO
-    df["IMO"] = (
-        pd.to_numeric(df["IMO"], errors="coerce").fillna(0).astype(int).astype(str)
-    )
-
-    # Länk till MarineTraffic
-    df["MT_Link"] = df["IMO"].apply(
-        lambda x: f"[Link](https://www.marinetraffic.com/en/ais/details/ships/imo:{x})"
-    )
+    # Fixa IMO (länken till MarineTraffic byggs först när en tabellsida skickas)
+    df["IMO"] = pd.to_numeric(df["IMO"], errors="coerce").fillna(0).astype(int)
+    if not COMPACT_MODE:
+        df["IMO"] = df["IMO"].astype(str)
 
     # Fixa Type
     if "Type" not in df.columns:
@@ -54,6 +81,13 @@ try:
     else:
         df["Type"] = df["Type"].fillna("Unknown")
 
+    return compact_frame(df) if COMPACT_MODE else df
+
+
+model_metrics = load_metrics()
+
+try:
+    df = load_vessels()
 except FileNotFoundError:
     print("WARNING: Data file not found. Using dummy data.")
     df = pd.DataFrame(
@@ -65,568 +99,1555 @@ except FileNotFoundError:
             "Flag": ["Unknown"],
             "Age": [10],
             "GT": [10000],
-            "MT_Link": ["#"],
         }
     )
+    if COMPACT_MODE:
+        df = compact_frame(df)
+
+# --- SCATTER: WEBGL OCH NEDSAMPLING ---
+# Över SCATTER_WEBGL_THRESHOLD punkter ritas scattern med WebGL istället för SVG.
+# Över SCATTER_MAX_POINTS skickas exakt SCATTER_MAX_POINTS fartyg: det mest riskfyllda
+# per ruta i ett Age x GT-rutnät (så att outliers syns), och resten av budgeten fylls med
+# de mest riskfyllda av övriga. Antalet punkter minskar alltså aldrig när tröskeln sänks.
+SCATTER_WEBGL_THRESHOLD = 1000
+SCATTER_MAX_POINTS = 5000
+SCATTER_SIZE_MAX = 20  # största markören i px (px.scatter:s size_max)
+SCATTER_GRID = (150, 100)  # (Age-rutor, GT-rutor)
+
+# Histogrammets fasta binning (20 lika breda intervall på 0-1)
+HIST_EDGES = np.linspace(0, 1, 21)
+HIST_CENTERS = (HIST_EDGES[:-1] + HIST_EDGES[1:]) / 2
+
+TABLE_COLUMNS = [
+    "IMO",
+    "Name",
+    "Type",
+    "Shadow_Probability",
+    "Flag",
+    "Age",
+    "GT",
+]
+
+# Tabellkolumner som inte lagras per rad, utan sorteras via en annan kolumn
+SORT_ALIASES = {"MT_Link": "IMO"}
+
+
+def mt_link(imo):
+    """Markdown-länkar till MarineTraffic för en Series med IMO-nummer."""
+    return (
+        "[Link](https://www.marinetraffic.com/en/ais/details/ships/imo:"
+        + imo.astype(str)
+        + ")"
+    )
+
+
+# --- SÖKNING ---
+# Sökrutan slår upp IMO i en hashtabell och namn i ett trigram-index; flagg- och
+# typfiltren använder inverterade index. Allt byggs en gång i FleetIndex.
+NAME_MATCH_SHARE = 0.6  # andel av söktermens trigram ett namn måste ha för att matcha
+TRIGRAM_CHUNK_ROWS = 20_000  # namn per block när trigram-indexet byggs
+IMO_QUERY = re.compile(r"(?:IMO ?)?(\d{7})")
+# ASCII-klasser, så att re (söktermen) och pyarrow (namnen) delar upp likadant
+NAME_SEPARATORS = re.compile(r"[\W_]+", re.ASCII)
+
+
+def normalize_name(names: pd.Series) -> pd.Series:
+    """Versaler, allt utom bokstäver och siffror blir ett mellanslag."""
+    return (
+        names.astype(str)
+        .str.upper()
+        .str.replace(NAME_SEPARATORS.pattern, " ", regex=True)
+        .str.strip()
+    )
+
+
+def trigram_codes(names: np.ndarray):
+    """
+    Alla trigram i en array med strängar, som int64 (tre tecken à 21 bitar), plus en mask
+    för de trigram som ligger innanför strängen (resten är utfyllnad till samma längd).
+    """
+    width = names.dtype.itemsize // 4
+    chars = names.view(np.uint32).reshape(len(names), width).astype(np.int64)
+    codes = chars[:, :-2] << 42 | chars[:, 1:-1] << 21 | chars[:, 2:]
+    return codes, chars[:, 2:] > 0
+
+
+def trigram_index(names: pd.Series, chunk_rows: int = TRIGRAM_CHUNK_ROWS):
+    """
+    Trigram -> radpositioner i CSR-form: (sorterade trigram, offsets, rader). Raderna
+    per trigram är unika och stigande. Namnen får ett mellanslag i varje ände, så att
+    början och slutet av namnet också blir egna trigram.
+    """
+    padded = (" " + names + " ").to_numpy(dtype=str)
+    all_codes, all_rows = [np.empty(0, np.int64)], [np.empty(0, np.int32)]
+    for start in range(0, len(padded), chunk_rows):
+        codes, valid = trigram_codes(padded[start : start + chunk_rows])
+        all_codes.append(codes[valid])
+        all_rows.append((np.nonzero(valid)[0] + start).astype(np.int32))
+    codes, rows = np.concatenate(all_codes), np.concatenate(all_rows)
+
+    order = np.lexsort((rows, codes))
+    codes, rows = codes[order], rows[order]
+    # Ett trigram som förekommer flera gånger i samma namn räknas en gång
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    codes, rows = codes[first], rows[first]
+
+    keys, starts = np.unique(codes, return_index=True)
+    return keys, np.append(starts, len(codes)), rows
+
+
+def inverted_index(codes: np.ndarray, n_levels: int):
+    """Kategorikod -> radpositioner: rows[offsets[c] : offsets[c + 1]] har kod c."""
+    rows = np.argsort(codes, kind="stable").astype(np.int32)
+    offsets = np.searchsorted(codes[rows], np.arange(n_levels + 1))
+    return rows, offsets
+
+
+class FleetIndex:
+    """
+    Fartygsdatan sorterad på risk (högst först) plus index som räknas ut en gång vid start.
+    - Varje tröskel på slidern motsvarar ett prefix av raderna (searchsorted istället för mask + sort)
+    - KPI:er, flagg- och typräkningar cachas per prefix-längd
+    - Tabellen sorteras via förberäknade platser i sorteringen per kolumn
+    - Sökningen (IMO, namn, flagga, typ) går via hash-, trigram- och inverterade index
+    """
+
+    def __init__(self, frame: pd.DataFrame, version=None):
+        self.version = version
+        self.df = frame.sort_values(
+            by="Shadow_Probability", ascending=False, kind="stable"
+        ).reset_index(drop=True)
+
+        # --- GRAF-GRÄNSER (FÖR ATT LÅSA AXLARNA) ---
+        # Max-värdena för HELA datasetet räknas ut en gång, så vi kan låsa graferna till detta.
+        self.max_age = self.df["Age"].max() * 1.05
+        self.max_gt = self.df["GT"].max() * 1.05
+
+        # searchsorted kräver stigande ordning -> negera sannolikheterna
+        self.neg_prob = -self.df["Shadow_Probability"].to_numpy(dtype=float)
+
+        # Prefixsummor ger medelvärden för valfri tröskel i konstant tid
+        self.cum_age = np.concatenate(
+            ([0.0], np.cumsum(self.df["Age"].to_numpy(dtype=float)))
+        )
+        self.cum_risk = np.concatenate(([0.0], np.cumsum(-self.neg_prob)))
+
+        # Kategorikoder (sorterade nivåer, så att lika räkningar ger samma dominerande flagga som mode())
+        self.flag_codes, self.flag_levels = pd.factorize(self.df["Flag"], sort=True)
+        self.type_codes, self.type_levels = pd.factorize(self.df["Type"], sort=True)
+
+        # IMO -> radposition (vid dubbletter den mest riskfyllda raden)
+        imos = pd.to_numeric(self.df["IMO"], errors="coerce").fillna(0).astype("int64")
+        first = ~imos.duplicated() & (imos > 0)
+        self.imo_position = dict(zip(imos[first], np.flatnonzero(first)))
+
+        # --- SÖKINDEX ---
+        # Flagga/typ -> radpositioner (inverterade index, stigande = riskordning per kod)
+        self.flag_rows, self.flag_offsets = inverted_index(
+            self.flag_codes, len(self.flag_levels)
+        )
+        self.type_rows, self.type_offsets = inverted_index(
+            self.type_codes, len(self.type_levels)
+        )
+        # Namn: trigram -> radpositioner (fritext/fuzzy) och sorterade namn (prefix)
+        names = normalize_name(self.df["Name"].astype(object).fillna(""))
+        self.gram_keys, self.gram_offsets, self.gram_rows = trigram_index(names)
+        self.name_order = np.argsort(names.to_numpy(dtype=str), kind="stable").astype(
+            np.int32
+        )
+        self.sorted_names = names.to_numpy(dtype=str)[self.name_order]
+
+        # Plats i sorteringen per rad och (kolumn, riktning). Tabellen sorterar bara den
+        # sida den visar: argpartition på platserna istället för en ordning över allt
+        self.sort_rank = {}
+        for col in TABLE_COLUMNS:
+            for direction in ("asc", "desc"):
+                order = (
+                    self.df[col]
+                    .sort_values(
+                        ascending=direction == "asc", kind="stable", na_position="last"
+                    )
+                    .index.to_numpy()
+                )
+                rank = np.empty(len(order), dtype=np.int32)
+                rank[order] = np.arange(len(order), dtype=np.int32)
+                self.sort_rank[(col, direction)] = rank
+
+        # Rutnätscell per fartyg (Age x GT) för nedsampling av scattern
+        age_bins, gt_bins = SCATTER_GRID
+        age = self.df["Age"].to_numpy(dtype=float)
+        gt = self.df["GT"].to_numpy(dtype=float)
+        age_cell = np.nan_to_num(age / (np.nanmax(age) or 1) * (age_bins - 1))
+        gt_cell = np.nan_to_num(gt / (np.nanmax(gt) or 1) * (gt_bins - 1))
+        self.scatter_cell = np.clip(age_cell, 0, age_bins - 1).astype(
+            np.int32
+        ) * gt_bins + np.clip(gt_cell, 0, gt_bins - 1).astype(np.int32)
+
+        self.summary = lru_cache(maxsize=256)(self._summary)
+        self.scatter_rows = lru_cache(maxsize=256)(self._scatter_rows)
+        self.search = lru_cache(maxsize=256)(self._search)
+
+    def warm_up(self):
+        """Fyller cacharna för alla sliderlägen (steg 0.01), så första användaren slipper vänta."""
+        for min_risk in np.linspace(0, 1, 101):
+            n = self.prefix_len(min_risk)
+            self.summary(n)
+            self.scatter_rows(n)
+
+    def prefix_len(self, min_risk: float) -> int:
+        """Antal fartyg med Shadow_Probability >= min_risk."""
+        return int(np.searchsorted(self.neg_prob, -min_risk, side="right"))
+
+    @staticmethod
+    def _level_counts(codes, levels, n):
+        # -1 (saknat värde) flyttas till plats 0 och slängs
+        counts = np.bincount(codes[:n] + 1, minlength=len(levels) + 1)[1:]
+        counts = pd.Series(counts, index=levels)
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def _scatter_rows(self, n: int) -> np.ndarray:
+        """Radpositioner att rita i scattern för de n första fartygen."""
+        if n <= SCATTER_MAX_POINTS:
+            return np.arange(n)
+        # Prefixet är sorterat på risk, så första träffen per cell är det mest riskfyllda fartyget
+        _, first = np.unique(self.scatter_cell[:n], return_index=True)
+        first = np.sort(first)[:SCATTER_MAX_POINTS]
+        # Fyll upp budgeten med de mest riskfyllda fartygen som inte redan är med
+        rest = np.ones(n, dtype=bool)
+        rest[first] = False
+        fill = np.flatnonzero(rest)[: SCATTER_MAX_POINTS - len(first)]
+        return np.sort(np.concatenate((first, fill)))
+
+    def _name_matches(self, query: str) -> np.ndarray:
+        """
+        Radpositioner vars namn matchar query, bästa träffarna först (sedan riskordning).
+        Korta söktermer matchas som prefix. Längre delas upp i trigram, och ett namn
+        matchar om det har minst NAME_MATCH_SHARE av söktermens trigram, så att
+        stavfel och saknade ord fortfarande ger träff.
+        """
+        if len(query) < 3:
+            lo, hi = np.searchsorted(self.sorted_names, [query, query + "\U0010ffff"])
+            return np.sort(self.name_order[lo:hi])
+
+        codes, valid = trigram_codes(np.array([query]))
+        grams = np.unique(codes[valid])
+        slots = np.searchsorted(self.gram_keys, grams).clip(max=len(self.gram_keys) - 1)
+        slots = slots[self.gram_keys[slots] == grams] if len(self.gram_keys) else []
+        if not len(slots):
+            return np.empty(0, dtype=np.int32)
+        # Antal gemensamma trigram per rad; bincount istället för sortering, eftersom
+        # vanliga trigram (t.ex. " ST") har långa listor
+        shared = np.bincount(
+            np.concatenate(
+                [
+                    self.gram_rows[self.gram_offsets[i] : self.gram_offsets[i + 1]]
+                    for i in slots
+                ]
+            ),
+            minlength=len(self.df),
+        )
+        rows = np.flatnonzero(shared >= math.ceil(NAME_MATCH_SHARE * len(grams)))
+        shared = shared[rows]
+        # Flest gemensamma trigram först, annars riskordning (stigande rad)
+        return rows[np.argsort(-shared, kind="stable")]
+
+    @staticmethod
+    def _code_rows(rows_index, offsets, codes):
+        parts = [rows_index[offsets[c] : offsets[c + 1]] for c in codes]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, np.int32)
+
+    def _search(self, query: str = "", flags: tuple = (), types: tuple = ()):
+        """
+        Radpositioner som matchar sökrutan (IMO eller namn) och valda flaggor/typer.
+        None om inget sökvillkor är satt. Sökrutan (annars första valda filtret) ger
+        kandidaterna via sitt index, övriga villkor kontrolleras per kandidat via
+        kategorikoderna, så datan skannas aldrig.
+        """
+        rows = None
+        query = NAME_SEPARATORS.sub(" ", query.upper()).strip()
+        if query:
+            imo = IMO_QUERY.fullmatch(query)
+            if imo:
+                position = self.imo_position.get(int(imo.group(1)))
+                rows = np.array([] if position is None else [position], dtype=np.int32)
+            else:
+                rows = self._name_matches(query)
+
+        for values, codes_all, levels, rows_index, offsets in (
+            (
+                flags,
+                self.flag_codes,
+                self.flag_levels,
+                self.flag_rows,
+                self.flag_offsets,
+            ),
+            (
+                types,
+                self.type_codes,
+                self.type_levels,
+                self.type_rows,
+                self.type_offsets,
+            ),
+        ):
+            if not values:
+                continue
+            codes = levels.get_indexer(list(values))
+            codes = codes[codes >= 0]
+            if rows is None:
+                rows = self._code_rows(rows_index, offsets, codes)
+            else:
+                rows = rows[np.isin(codes_all[rows], codes)]
+        return rows
+
+    def _summary(self, n: int) -> dict:
+        """Aggregat för de n första (mest riskfyllda) fartygen."""
+        flag_counts = self._level_counts(self.flag_codes, self.flag_levels, n)
+        type_counts = self._level_counts(self.type_codes, self.type_levels, n)
+        return {
+            "count": n,
+            "avg_age": self.cum_age[n] / n if n else None,
+            "avg_risk": self.cum_risk[n] / n if n else None,
+            "dom_flag": (
+                flag_counts.index[flag_counts.argmax()] if len(flag_counts) else None
+            ),
+            "flag_counts": flag_counts,
+            "type_counts": type_counts,
+            "hist_counts": np.histogram(-self.neg_prob[:n], bins=HIST_EDGES)[0],
+        }
+
+
+# --- HOT RELOAD ---
+# En bakgrundstråd bevakar filerna som first_sort.py skriver. När de ändrats (och slutat
+# ändras) läses de in, alla index byggs och cacharna värms i bakgrunden, och sedan byts
+# `fleet` och `model_metrics` ut med en tilldelning. Callbacks tar en referens till `fleet`
+# i början av anropet och räknar klart på den, så pågående anrop påverkas inte av bytet.
+#
+# Med gunicorn bevakar och laddar varje worker för sig, så de byter version vid olika
+# tidpunkter. Versionen jämförs därför på filernas mtime: webbläsaren tar bara emot en
+# nyare version, och en worker som får en fråga om en nyare version än den har laddar om
+# direkt istället för att svara med gammal data. Obs: en omladdning ger en egen kopia av
+# datan i varje worker, copy-on-write-delningen från master gäller bara till första
+# omladdningen. Starta om gunicorn för att dela datan igen (HUP räcker inte, master
+# har kvar den gamla datan från preload_app).
+RELOAD_INTERVAL = float(os.environ.get("SHADOW_FLEET_RELOAD_INTERVAL", 30))  # 0 = av
+WATCHED_FILES = [SCORE_FILE, store_path(SCORE_FILE), METRICS_FILE]
+
+
+def artifact_signature():
+    return tuple(
+        os.path.getmtime(path) if os.path.exists(path) else None
+        for path in WATCHED_FILES
+    )
 
-# --- BERÄKNA GLOBALA GRAF-GRÄNSER (FÖR ATT LÅSA AXLARNA) ---
-# Vi räknar ut max-värdena för HELA datasetet en gång, så vi kan låsa graferna till detta.
-MAX_AGE = df["Age"].max() * 1.05
-MAX_GT = df["GT"].max() * 1.05
 
-# Feature Importance Data
+def data_version(signature):
+    """Samma filer ger samma version i alla worker-processer."""
+    return ";".join(str(mtime) for mtime in signature)
+
+
+def version_key(version):
+    """
+    Senaste mtime i en version, så att versioner kan jämföras (nyare = större). Versionen
+    kommer från webbläsaren; en som inte går att tolka räknas som äldst, så att klienten
+    får den aktuella versionen.
+    """
+    try:
+        mtimes = [
+            float(mtime)
+            for mtime in str(version or "").split(";")
+            if mtime not in ("", "None")
+        ]
+    except ValueError:
+        return float("-inf")
+    if not all(math.isfinite(mtime) for mtime in mtimes):
+        return float("-inf")
+    return max(mtimes, default=0.0)
+
+
+fleet = FleetIndex(df, version=data_version(artifact_signature()))
+fleet.warm_up()
+_reload_lock = threading.Lock()
+
+
+def reload_data():
+    """Läser in filerna igen om de ändrats sedan `fleet` laddades. En omladdning i taget."""
+    global fleet, model_metrics
+    with _reload_lock:
+        version = data_version(artifact_signature())
+        if version == fleet.version:
+            return
+        new_fleet = FleetIndex(load_vessels(), version=version)
+        new_fleet.warm_up()
+        new_metrics = load_metrics()
+        fleet, model_metrics = new_fleet, new_metrics
+    print(f"Reloaded {len(new_fleet.df)} vessels (version {new_fleet.version}).")
+
+
+def fleet_for(version):
+    """
+    `fleet` för en callback med webbläsarens dataversion. Har webbläsaren redan en nyare
+    version (från en annan worker) laddas den här processen om först.
+    """
+    data = fleet
+    if version_key(version) > version_key(data.version):
+        try:
+            reload_data()
+        except Exception as e:
+            print(f"WARNING: Reload failed, keeping current data: {e}")
+        data = fleet
+    return data
+
+
+def watch_artifacts():
+    failed = None
+    pending = None
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        signature = artifact_signature()
+        if data_version(signature) == fleet.version or signature == failed:
+            pending = None
+            continue
+        if signature != pending:
+            # Vänta ett varv till så att vi inte läser en fil som håller på att skrivas
+            pending = signature
+            continue
+        try:
+            reload_data()
+        except Exception as e:
+            print(f"WARNING: Reload failed, keeping current data: {e}")
+            failed = signature
+
+
+_watcher = PerProcessThread(watch_artifacts, "artifact-watcher")
+
+
+def start_reload_watcher():
+    """Startar bevakningstråden i den här processen om den inte redan körs."""
+    if RELOAD_INTERVAL > 0:
+        _watcher.start()
+
+
+# Symbolerna DataTable kan skicka, och operatornamnet filter_mask använder för dem
+FILTER_SYMBOLS = {">=": "ge", "<=": "le", "<": "lt", ">": "gt", "!=": "ne", "=": "eq"}
+
+# {kolumn} <operator> <värde>; operatorn läses bara direkt efter "}", så ord som
+# "le " eller "ne " inne i värdet (t.ex. "Isle of Man") inte tas för operatorer.
+# Ett i/s-prefix (skiftlägesokänslig/-känslig) är tillåtet, ordoperatorer kräver mellanslag.
+FILTER_PART = re.compile(
+    r"^\s*\{(?P<col>[^}]+)\}\s*"
+    r"(?:(?P<symbol>[is]?(?:[<>!]=|[<>=]))\s*"
+    r"|(?P<word>[is]?(?:ge|le|lt|gt|ne|eq|contains|datestartswith))(?:\s+|$))"
+    r"(?P<value>.*?)\s*$"
+)
+
+
+def split_filter_part(filter_part):
+    """Delar upp ett DataTable-filter, t.ex. '{Age} > 20', i (kolumn, operator, värde)."""
+    match = FILTER_PART.match(filter_part)
+    if not match:
+        return [None] * 3
+
+    operator = match["symbol"] or match["word"]
+    if operator != "icontains" and operator[0] in "is":
+        # Prefixet spelar bara roll för contains (icontains är skiftlägesokänslig)
+        operator = operator[1:]
+    operator = FILTER_SYMBOLS.get(operator, operator)
+
+    value_part = match["value"]
+    v0 = value_part[0] if value_part else ""
+    if v0 and len(value_part) > 1 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+        value = value_part[1:-1].replace("\\" + v0, v0)
+    else:
+        try:
+            value = float(value_part)
+        except ValueError:
+            value = value_part
+
+    return match["col"], operator, value
+
+
+def filter_mask(frame, filter_query):
+    """Boolesk mask över frame för DataTables filter_query (delar sammanfogade med ' && ')."""
+    mask = np.ones(len(frame), dtype=bool)
+    if not filter_query:
+        return mask
+
+    for filter_part in filter_query.split(" && "):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in frame.columns:
+            continue
+        col = frame[col_name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype(str)
+
+        if operator in ("eq", "ne", "lt", "le", "gt", "ge"):
+            if isinstance(filter_value, str) and pd.api.types.is_numeric_dtype(col):
+                try:
+                    filter_value = float(filter_value)
+                except ValueError:
+                    # Ett värde som inte är ett tal matchar inget i en numerisk kolumn
+                    mask[:] = False
+                    continue
+            if isinstance(filter_value, float) and not pd.api.types.is_numeric_dtype(
+                col
+            ):
+                # IMO m.fl. lagras som text, jämför då mot texten användaren skrev
+                filter_value = (
+                    str(int(filter_value))
+                    if filter_value.is_integer()
+                    else str(filter_value)
+                )
+            part = getattr(col, operator)(filter_value).to_numpy()
+        elif operator in ("contains", "icontains"):
+            part = (
+                col.astype(str)
+                .str.contains(
+                    str(filter_value), case=operator == "contains", regex=False
+                )
+                .to_numpy()
+            )
+        elif operator == "datestartswith":
+            part = col.astype(str).str.startswith(str(filter_value)).to_numpy()
+        else:
+            continue
+        mask &= part
+
+    return mask
 
 
 # --- 2. LAYOUT ---
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 
-app.layout = dbc.Container(
-    [
-        # --- HEADER & KONTROLLER (Fast del) ---
-        html.Div(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            html.H2(
-                                "Shadow Fleet Intelligence Dashboard",
-                                className="text-center my-4",
-                            ),  # Mer marginal (my-4)
-                            width=12,
-                        )
-                    ]
-                ),
-                # KPI Kort (Mer luft med className="mb-4" och g-4 för gap mellan kolumner)
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            dbc.Card(
-                                dbc.CardBody(
-                                    [html.H6("Total Vessels"), html.H3(id="kpi-count")]
+# WSGI-objektet för produktion, t.ex. `gunicorn -c gunicorn.conf.py app:server`
+server = app.server
+
+
+server.before_request(start_reload_watcher)
+
+
+@server.route("/healthz")
+def healthz():
+    data = fleet
+    return {"status": "ok", "vessels": len(data.df), "version": data.version}
+
+
+# --- POÄNGSÄTTNING PÅ BEGÄRAN ---
+# /api/score poängsätter fartyg med den sparade modellen, även fartyg som inte fanns med
+# när first_sort.py körde. Se score_service.py för batchning och cache.
+scoring = ScoringService()
+SCORE_FIELDS = {name.lower(): name for name in ["IMO", "Size"] + PARTICULARS}
+SCORE_FIELD_NAMES = ", ".join(SCORE_FIELDS.values())
+MAX_SCORE_VESSELS = 10_000
+
+
+NUMERIC_SCORE_FIELDS = ["Built", "DWT", "Length"]
+
+
+def parse_number(name, value):
+    """Talet i ett numeriskt fält ("106,650" går bra). ValueError om det inte är ett tal."""
+    try:
+        number = float(str(value).replace(",", "").strip())
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    return number
+
+
+def parse_imo(value):
+    """IMO som heltal. Bool, decimaltal och text som inte är ett heltal ger ValueError."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, str)) and not isinstance(value, bool):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid IMO: {value!r}")
+
+
+def check_particulars(vessel):
+    """ValueError för värden som annars skulle tolkas som okända eller göras om till text."""
+    for name, value in vessel.items():
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"{name} must be a single value, got {value!r}")
+        if name in NUMERIC_SCORE_FIELDS:
+            parse_number(name, value)
+        elif name == "Size":
+            parse_number("Size (length)", str(value).split("/", 1)[0])
+
+
+def vessel_particulars(data, vessel):
+    """
+    Uppgifterna som ska poängsättas: fartygets rad i datan (via IMO) plus angivna fält.
+    Okända fält (t.ex. felstavade) och fartyg helt utan uppgifter ger ValueError, så att
+    de inte poängsätts som ett fartyg där allt är okänt.
+    """
+    unknown = sorted(key for key in vessel if key.lower() not in SCORE_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(unknown)}. Expected {SCORE_FIELD_NAMES}"
+        )
+    vessel = {
+        SCORE_FIELDS[key.lower()]: value
+        for key, value in vessel.items()
+        if key.lower() in SCORE_FIELDS and value not in (None, "")
+    }
+    imo = vessel.pop("IMO", None)
+    check_particulars(vessel)
+    if imo is None:
+        if not vessel:
+            raise ValueError(
+                "Provide an IMO or at least one of "
+                + ", ".join(name for name in SCORE_FIELDS.values() if name != "IMO")
+            )
+        return None, vessel
+
+    imo = parse_imo(imo)
+    position = data.imo_position.get(imo)
+    if position is None:
+        if not vessel:
+            raise LookupError(f"IMO {imo} not found, provide the vessel particulars")
+        return imo, vessel
+
+    row = data.df.iloc[position]
+    known = {col: row[col] for col in PARTICULARS if col in data.df.columns}
+    return imo, {**known, **vessel}
+
+
+@server.route("/api/score", methods=["GET", "POST"])
+def api_score():
+    """
+    GET  /api/score?imo=9299941  or  ?type=...&flag=...&built=...&dwt=...&size=250/46
+    POST /api/score  with one vessel as a JSON object, or a list of them
+    """
+    if request.method == "POST":
+        payload = request.get_json(silent=True)
+        vessels = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(vessel, dict) for vessel in vessels):
+            return {"error": "Expected a JSON object or a list of objects"}, 400
+        if len(vessels) > MAX_SCORE_VESSELS:
+            return {"error": f"At most {MAX_SCORE_VESSELS} vessels per request"}, 400
+    else:
+        payload = request.args.to_dict()
+        vessels = [payload]
+
+    data = fleet
+    try:
+        resolved = [vessel_particulars(data, vessel) for vessel in vessels]
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except LookupError as e:
+        return {"error": str(e)}, 404
+
+    try:
+        scores = scoring.score_many([particulars for _, particulars in resolved])
+    except (FileNotFoundError, TimeoutError) as e:
+        return {"error": str(e)}, 503
+
+    results = [
+        {
+            "IMO": imo,
+            **dict(zip(PARTICULARS, normalize_particulars(particulars))),
+            "Shadow_Probability": probability,
+            "cached": cached,
+        }
+        for (imo, particulars), (probability, cached) in zip(resolved, scores)
+    ]
+    if isinstance(payload, list):
+        return {"model": scoring.version, "vessels": results}
+    return {"model": scoring.version, **results[0]}
+
+
+def serve_layout():
+    # Byggs vid varje sidladdning, så nya nyckeltal syns efter en omladdning
+    metrics = model_metrics
+    data = fleet
+    return dbc.Container(
+        [
+            # Datans version; ändras när bevakningstråden laddat nya filer
+            dcc.Store(id="data-version", data=data.version),
+            dcc.Interval(
+                id="reload-check",
+                interval=max(RELOAD_INTERVAL, 1) * 1000,
+                disabled=RELOAD_INTERVAL <= 0,
+            ),
+            # --- HEADER & KONTROLLER (Fast del) ---
+            html.Div(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                html.H2(
+                                    "Shadow Fleet Intelligence Dashboard",
+                                    className="text-center my-4",
+                                ),  # Mer marginal (my-4)
+                                width=12,
+                            )
+                        ]
+                    ),
+                    # KPI Kort (Mer luft med className="mb-4" och g-4 för gap mellan kolumner)
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dbc.Card(
+                                    dbc.CardBody(
+                                        [
+                                            html.H6("Total Vessels"),
+                                            html.H3(id="kpi-count"),
+                                        ]
+                                    ),
+                                    color="primary",
+                                    inverse=True,
+                                    className="h-100 shadow-sm",
                                 ),
-                                color="primary",
-                                inverse=True,
-                                className="h-100 shadow-sm",
+                                width=3,
                             ),
-                            width=3,
-                        ),
-                        dbc.Col(
-                            dbc.Card(
-                                dbc.CardBody(
-                                    [html.H6("Avg Age"), html.H3(id="kpi-age")]
+                            dbc.Col(
+                                dbc.Card(
+                                    dbc.CardBody(
+                                        [html.H6("Avg Age"), html.H3(id="kpi-age")]
+                                    ),
+                                    color="info",
+                                    inverse=True,
+                                    className="h-100 shadow-sm",
                                 ),
-                                color="info",
-                                inverse=True,
-                                className="h-100 shadow-sm",
+                                width=3,
                             ),
-                            width=3,
-                        ),
-                        dbc.Col(
-                            dbc.Card(
-                                dbc.CardBody(
-                                    [html.H6("Avg Risk Score"), html.H3(id="kpi-risk")]
+                            dbc.Col(
+                                dbc.Card(
+                                    dbc.CardBody(
+                                        [
+                                            html.H6("Avg Risk Score"),
+                                            html.H3(id="kpi-risk"),
+                                        ]
+                                    ),
+                                    color="danger",
+                                    inverse=True,
+                                    className="h-100 shadow-sm",
                                 ),
-                                color="danger",
-                                inverse=True,
-                                className="h-100 shadow-sm",
+                                width=3,
                             ),
-                            width=3,
-                        ),
-                        dbc.Col(
-                            dbc.Card(
-                                dbc.CardBody(
-                                    [html.H6("Dominant Flag"), html.H3(id="kpi-flag")]
+                            dbc.Col(
+                                dbc.Card(
+                                    dbc.CardBody(
+                                        [
+                                            html.H6("Dominant Flag"),
+                                            html.H3(id="kpi-flag"),
+                                        ]
+                                    ),
+                                    color="secondary",
+                                    inverse=True,
+                                    className="h-100 shadow-sm",
                                 ),
-                                color="secondary",
-                                inverse=True,
-                                className="h-100 shadow-sm",
+                                width=3,
                             ),
-                            width=3,
-                        ),
-                    ],
-                    className="mb-4 g-3",
-                ),  # g-3 ger utrymme MELLAN korten
-                # Slider (Mer luft runt omkring)
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            [
-                                html.Label(
-                                    "Risk Sensitivity Filter (0.00 - 1.00):",
-                                    className="fw-bold mb-2",
+                        ],
+                        className="mb-4 g-3",
+                    ),  # g-3 ger utrymme MELLAN korten
+                    # Slider (Mer luft runt omkring)
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                [
+                                    html.Label(
+                                        "Risk Sensitivity Filter (0.00 - 1.00):",
+                                        className="fw-bold mb-2",
+                                    ),
+                                    dcc.Slider(
+                                        id="risk-slider",
+                                        min=0,
+                                        max=1,
+                                        step=0.01,
+                                        value=0.0,
+                                        marks={
+                                            0: "0%",
+                                            0.5: "50%",
+                                            0.8: "High Risk",
+                                            1: "100%",
+                                        },
+                                        tooltip={
+                                            "placement": "bottom",
+                                            "always_visible": True,
+                                        },
+                                    ),
+                                ],
+                                width=12,
+                            )
+                        ],
+                        className="mb-4 px-3",
+                    ),  # px-3 ger lite padding på sidorna
+                    # Sökning i tabellen (IMO eller namn, plus flagga och typ)
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dbc.Input(
+                                    id="vessel-search",
+                                    type="search",
+                                    placeholder="Search IMO or vessel name...",
+                                    debounce=True,
                                 ),
-                                dcc.Slider(
-                                    id="risk-slider",
-                                    min=0,
-                                    max=1,
-                                    step=0.01,
-                                    value=0.0,
-                                    marks={
-                                        0: "0%",
-                                        0.5: "50%",
-                                        0.8: "High Risk",
-                                        1: "100%",
-                                    },
-                                    tooltip={
-                                        "placement": "bottom",
-                                        "always_visible": True,
-                                    },
+                                width=6,
+                            ),
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id="flag-filter",
+                                    options=[str(flag) for flag in data.flag_levels],
+                                    multi=True,
+                                    placeholder="Flag",
                                 ),
-                            ],
-                            width=12,
-                        )
-                    ],
-                    className="mb-4 px-3",
-                ),  # px-3 ger lite padding på sidorna
-            ]
-        ),
-        # --- SCROLLABLE CONTENT ---
-        html.Div(
-            [
-                dbc.Tabs(
-                    [
-                        # TAB 1: FLEET ANALYSIS
-                        dbc.Tab(
-                            label="Fleet Operations & Analysis",
-                            children=[
-                                html.Div(
-                                    [  # Wrapper för padding inuti fliken
-                                        # Rad 1: Scatter & Bar (Ökad höjd och marginaler)
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [  # Lägger grafer i kort för snyggare inramning
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        dcc.Graph(
-                                                                            id="scatter-plot",
-                                                                            style={
-                                                                                "height": "45vh"
-                                                                            },
-                                                                        )  # Lite högre graf
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=7,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        dcc.Graph(
-                                                                            id="bar-chart",
-                                                                            style={
-                                                                                "height": "45vh"
-                                                                            },
-                                                                        )
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=5,
-                                                ),
-                                            ],
-                                            className="mb-4 g-4",
-                                        ),  # Stort avstånd under och mellan
-                                        # Rad 2: Pie & Histogram
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        dcc.Graph(
-                                                                            id="type-pie-chart",
-                                                                            style={
-                                                                                "height": "40vh"
-                                                                            },
-                                                                        )
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=6,
-                                                ),
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        dcc.Graph(
-                                                                            id="risk-histogram",
-                                                                            style={
-                                                                                "height": "40vh"
-                                                                            },
-                                                                        )
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=6,
-                                                ),
-                                            ],
-                                            className="mb-4 g-4",
-                                        ),
-                                        # Rad 3: Tabell
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardHeader(
-                                                                    html.H4(
-                                                                        "Detailed Vessel Database",
-                                                                        className="m-0",
+                                width=3,
+                            ),
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id="type-filter",
+                                    options=[str(t) for t in data.type_levels],
+                                    multi=True,
+                                    placeholder="Type",
+                                ),
+                                width=3,
+                            ),
+                        ],
+                        className="mb-4 px-3 g-3",
+                    ),
+                ]
+            ),
+            # --- SCROLLABLE CONTENT ---
+            html.Div(
+                [
+                    dbc.Tabs(
+                        [
+                            # TAB 1: FLEET ANALYSIS
+                            dbc.Tab(
+                                label="Fleet Operations & Analysis",
+                                children=[
+                                    html.Div(
+                                        [  # Wrapper för padding inuti fliken
+                                            # Rad 1: Scatter & Bar (Ökad höjd och marginaler)
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [  # Lägger grafer i kort för snyggare inramning
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            dcc.Graph(
+                                                                                id="scatter-plot",
+                                                                                style={
+                                                                                    "height": "45vh"
+                                                                                },
+                                                                            )  # Lite högre graf
+                                                                        ]
                                                                     )
-                                                                ),
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        dash_table.DataTable(
-                                                                            id="vessel-table",
-                                                                            columns=[
-                                                                                {
-                                                                                    "name": "IMO",
-                                                                                    "id": "IMO",
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=7,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            dcc.Graph(
+                                                                                id="bar-chart",
+                                                                                style={
+                                                                                    "height": "45vh"
                                                                                 },
-                                                                                {
-                                                                                    "name": "Name",
-                                                                                    "id": "Name",
+                                                                            )
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=5,
+                                                    ),
+                                                ],
+                                                className="mb-4 g-4",
+                                            ),  # Stort avstånd under och mellan
+                                            # Rad 2: Pie & Histogram
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            dcc.Graph(
+                                                                                id="type-pie-chart",
+                                                                                style={
+                                                                                    "height": "40vh"
                                                                                 },
-                                                                                {
-                                                                                    "name": "Type",
-                                                                                    "id": "Type",
+                                                                            )
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            dcc.Graph(
+                                                                                id="risk-histogram",
+                                                                                style={
+                                                                                    "height": "40vh"
                                                                                 },
-                                                                                {
-                                                                                    "name": "Risk",
-                                                                                    "id": "Shadow_Probability",
-                                                                                    "type": "numeric",
-                                                                                    "format": {
-                                                                                        "specifier": ".3f"
+                                                                            )
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=6,
+                                                    ),
+                                                ],
+                                                className="mb-4 g-4",
+                                            ),
+                                            # Rad 3: Tabell
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardHeader(
+                                                                        html.H4(
+                                                                            "Detailed Vessel Database",
+                                                                            className="m-0",
+                                                                        )
+                                                                    ),
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            dash_table.DataTable(
+                                                                                id="vessel-table",
+                                                                                columns=[
+                                                                                    {
+                                                                                        "name": "IMO",
+                                                                                        "id": "IMO",
                                                                                     },
-                                                                                },
-                                                                                {
-                                                                                    "name": "Flag",
-                                                                                    "id": "Flag",
-                                                                                },
-                                                                                {
-                                                                                    "name": "Age",
-                                                                                    "id": "Age",
-                                                                                },
-                                                                                {
-                                                                                    "name": "GT",
-                                                                                    "id": "GT",
-                                                                                },
-                                                                                {
-                                                                                    "name": "Map",
-                                                                                    "id": "MT_Link",
-                                                                                    "presentation": "markdown",
-                                                                                },
-                                                                            ],
-                                                                            data=[],
-                                                                            page_action="native",
-                                                                            page_current=0,
-                                                                            page_size=15,
-                                                                            sort_action="native",
-                                                                            style_cell={
-                                                                                "textAlign": "left",
-                                                                                "padding": "12px",
-                                                                                "fontSize": "13px",
-                                                                            },  # Mer padding i cellerna
-                                                                            style_header={
-                                                                                "backgroundColor": "#f8f9fa",
-                                                                                "fontWeight": "bold",
-                                                                                "borderBottom": "2px solid #dee2e6",
-                                                                            },
-                                                                            style_data_conditional=[
-                                                                                {
-                                                                                    "if": {
-                                                                                        "filter_query": "{Shadow_Probability} > 0.8"
+                                                                                    {
+                                                                                        "name": "Name",
+                                                                                        "id": "Name",
                                                                                     },
-                                                                                    "backgroundColor": "#fff3f3",
-                                                                                    "color": "#d63031",
-                                                                                }
-                                                                            ],
-                                                                        )
-                                                                    ]
-                                                                ),
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=12,
-                                                )
-                                            ],
-                                            className="mb-5",
-                                        ),  # Extra marginal längst ner
-                                    ],
-                                    className="p-3",
-                                )  # Padding runt hela flikens innehåll
-                            ],
-                        ),
-                        # TAB 2: MODEL INSIGHTS
-                        dbc.Tab(
-                            label="Model Insights",
-                            children=[
-                                html.Div(
-                                    [
-                                        # --- METRIC CARDS ROW ---
-                                        dbc.Row(
-                                            [
-                                                # CARD 1: SENSITIVITY
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        html.H5(
-                                                                            "Model Sensitivity",
-                                                                            className="text-center text-muted text-uppercase",
-                                                                        ),
-                                                                        html.H1(
-                                                                            f"{sensitivity_score:.1%}",
-                                                                            className="text-center text-success fw-bold",
-                                                                        ),
-                                                                        html.P(
-                                                                            "True shadow vessels correctly identified.",
-                                                                            className="text-center small text-muted mb-0",
-                                                                        ),
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0 mb-4 h-100",  # h-100 för samma höjd
-                                                        )
-                                                    ],
-                                                    width=4,
-                                                ),
-                                                # CARD 2: OOB SCORE (NYTT!)
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        html.H5(
-                                                                            "OOB Score",
-                                                                            className="text-center text-muted text-uppercase",
-                                                                        ),
-                                                                        html.H1(
-                                                                            f"{oob_score:.1%}",
-                                                                            className="text-center text-primary fw-bold",
-                                                                        ),
-                                                                        html.P(
-                                                                            "Model accuracy on unseen training data.",
-                                                                            className="text-center small text-muted mb-0",
-                                                                        ),
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0 mb-4 h-100",
-                                                        )
-                                                    ],
-                                                    width=4,
-                                                ),
-                                            ],
-                                            justify="center",  # Centrerar korten på mitten av sidan
-                                            className="mb-4",
-                                        ),
-                                        # --- FEATURE IMPORTANCE GRAPH ---
-                                        dbc.Row(
-                                            [
-                                                dbc.Col(
-                                                    [
-                                                        dbc.Card(
-                                                            [
-                                                                dbc.CardBody(
-                                                                    [
-                                                                        html.H4(
-                                                                            "Feature Importance",
-                                                                            className="mb-3",
-                                                                        ),
-                                                                        html.P(
-                                                                            "These metrics correspond to the Random Forest model features.",
-                                                                            className="text-muted mb-4",
-                                                                        ),
-                                                                        dcc.Graph(
-                                                                            id="feature-plot",
-                                                                            figure=px.bar(
-                                                                                feature_data.sort_values(
-                                                                                    "importance",
-                                                                                    ascending=True,
+                                                                                    {
+                                                                                        "name": "Type",
+                                                                                        "id": "Type",
+                                                                                    },
+                                                                                    {
+                                                                                        "name": "Risk",
+                                                                                        "id": "Shadow_Probability",
+                                                                                        "type": "numeric",
+                                                                                        "format": {
+                                                                                            "specifier": ".3f"
+                                                                                        },
+                                                                                    },
+                                                                                    {
+                                                                                        "name": "Flag",
+                                                                                        "id": "Flag",
+                                                                                    },
+                                                                                    {
+                                                                                        "name": "Age",
+                                                                                        "id": "Age",
+                                                                                    },
+                                                                                    {
+                                                                                        "name": "GT",
+                                                                                        "id": "GT",
+                                                                                    },
+                                                                                    {
+                                                                                        "name": "Map",
+                                                                                        "id": "MT_Link",
+                                                                                        "presentation": "markdown",
+                                                                                    },
+                                                                                ],
+                                                                                data=[],
+                                                                                page_action="custom",
+                                                                                page_current=0,
+                                                                                page_size=15,
+                                                                                sort_action="custom",
+                                                                                sort_mode="single",
+                                                                                sort_by=[],
+                                                                                filter_action="custom",
+                                                                                filter_query="",
+                                                                                style_cell={
+                                                                                    "textAlign": "left",
+                                                                                    "padding": "12px",
+                                                                                    "fontSize": "13px",
+                                                                                },  # Mer padding i cellerna
+                                                                                style_header={
+                                                                                    "backgroundColor": "#f8f9fa",
+                                                                                    "fontWeight": "bold",
+                                                                                    "borderBottom": "2px solid #dee2e6",
+                                                                                },
+                                                                                style_data_conditional=[
+                                                                                    {
+                                                                                        "if": {
+                                                                                            "filter_query": "{Shadow_Probability} > 0.8"
+                                                                                        },
+                                                                                        "backgroundColor": "#fff3f3",
+                                                                                        "color": "#d63031",
+                                                                                    }
+                                                                                ],
+                                                                            )
+                                                                        ]
+                                                                    ),
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=12,
+                                                    )
+                                                ],
+                                                className="mb-5",
+                                            ),  # Extra marginal längst ner
+                                        ],
+                                        className="p-3",
+                                    )  # Padding runt hela flikens innehåll
+                                ],
+                            ),
+                            # TAB 2: MODEL INSIGHTS
+                            dbc.Tab(
+                                label="Model Insights",
+                                children=[
+                                    html.Div(
+                                        [
+                                            # --- METRIC CARDS ROW ---
+                                            dbc.Row(
+                                                [
+                                                    # CARD 1: SENSITIVITY
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            html.H5(
+                                                                                "Model Sensitivity",
+                                                                                className="text-center text-muted text-uppercase",
+                                                                            ),
+                                                                            html.H1(
+                                                                                f"{metrics['sensitivity']:.1%}",
+                                                                                className="text-center text-success fw-bold",
+                                                                            ),
+                                                                            html.P(
+                                                                                "True shadow vessels correctly identified.",
+                                                                                className="text-center small text-muted mb-0",
+                                                                            ),
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0 mb-4 h-100",  # h-100 för samma höjd
+                                                            )
+                                                        ],
+                                                        width=4,
+                                                    ),
+                                                    # CARD 2: OOB SCORE (NYTT!)
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            html.H5(
+                                                                                "OOB Score",
+                                                                                className="text-center text-muted text-uppercase",
+                                                                            ),
+                                                                            html.H1(
+                                                                                f"{metrics['oob_score']:.1%}",
+                                                                                className="text-center text-primary fw-bold",
+                                                                            ),
+                                                                            html.P(
+                                                                                "Model accuracy on unseen training data.",
+                                                                                className="text-center small text-muted mb-0",
+                                                                            ),
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0 mb-4 h-100",
+                                                            )
+                                                        ],
+                                                        width=4,
+                                                    ),
+                                                ],
+                                                justify="center",  # Centrerar korten på mitten av sidan
+                                                className="mb-4",
+                                            ),
+                                            # --- FEATURE IMPORTANCE GRAPH ---
+                                            dbc.Row(
+                                                [
+                                                    dbc.Col(
+                                                        [
+                                                            dbc.Card(
+                                                                [
+                                                                    dbc.CardBody(
+                                                                        [
+                                                                            html.H4(
+                                                                                "Feature Importance",
+                                                                                className="mb-3",
+                                                                            ),
+                                                                            html.P(
+                                                                                "These metrics correspond to the Random Forest model features.",
+                                                                                className="text-muted mb-4",
+                                                                            ),
+                                                                            dcc.Graph(
+                                                                                id="feature-plot",
+                                                                                figure=px.bar(
+                                                                                    metrics[
+                                                                                        "feature_data"
+                                                                                    ].sort_values(
+                                                                                        "importance",
+                                                                                        ascending=True,
+                                                                                    ),
+                                                                                    x="importance",
+                                                                                    y="feature",
+                                                                                    orientation="h",
+                                                                                    template="plotly_white",
+                                                                                    color="importance",
+                                                                                    color_continuous_scale="Blues",
                                                                                 ),
-                                                                                x="importance",
-                                                                                y="feature",
-                                                                                orientation="h",
-                                                                                template="plotly_white",
-                                                                                color="importance",
-                                                                                color_continuous_scale="Blues",
+                                                                                style={
+                                                                                    "height": "45vh"
+                                                                                },
                                                                             ),
-                                                                            style={
-                                                                                "height": "45vh"
-                                                                            },
-                                                                        ),
-                                                                    ]
-                                                                )
-                                                            ],
-                                                            className="shadow-sm border-0",
-                                                        )
-                                                    ],
-                                                    width=8,
-                                                    className="mx-auto",
-                                                )
-                                            ]
-                                        ),
-                                    ],
-                                    className="p-4",
-                                )
-                            ],
-                        ),
-                    ],
-                    className="mt-3",
-                )
-            ],
-            style={"height": "100%", "overflowY": "auto"},
-        ),
-    ],
-    fluid=True,
-    style={
-        "height": "100vh",
-        "display": "flex",
-        "flexDirection": "column",
-        "overflow": "hidden",
-        "backgroundColor": "#f4f6f9",
-    },
-)
+                                                                        ]
+                                                                    )
+                                                                ],
+                                                                className="shadow-sm border-0",
+                                                            )
+                                                        ],
+                                                        width=8,
+                                                        className="mx-auto",
+                                                    )
+                                                ]
+                                            ),
+                                        ],
+                                        className="p-4",
+                                    )
+                                ],
+                            ),
+                        ],
+                        className="mt-3",
+                    )
+                ],
+                style={"height": "100%", "overflowY": "auto"},
+            ),
+        ],
+        fluid=True,
+        style={
+            "height": "100vh",
+            "display": "flex",
+            "flexDirection": "column",
+            "overflow": "hidden",
+            "backgroundColor": "#f4f6f9",
+        },
+    )
+
+
+app.layout = serve_layout
 
 
 # --- 3. CALLBACKS ---
 @app.callback(
-    [
-        Output("scatter-plot", "figure"),
-        Output("bar-chart", "figure"),
-        Output("type-pie-chart", "figure"),
-        Output("risk-histogram", "figure"),
-        Output("vessel-table", "data"),
-        Output("kpi-count", "children"),
-        Output("kpi-age", "children"),
-        Output("kpi-risk", "children"),
-        Output("kpi-flag", "children"),
-    ],
-    [Input("risk-slider", "value")],
+    Output("data-version", "data"),
+    [Input("reload-check", "n_intervals")],
+    [State("data-version", "data")],
+    prevent_initial_call=True,
 )
-def update_dashboard(min_risk):
-    # Filtrera data
-    filtered_df = df[df["Shadow_Probability"] >= min_risk].copy()
-    filtered_df = filtered_df.sort_values(by="Shadow_Probability", ascending=False)
+def check_data_version(n_intervals, known_version):
+    # Ny version -> alla figurer, KPI:er och tabellen hämtar om sin data
+    # Bara nyare versioner, så att en worker som inte laddat om än inte tar klienten bakåt
+    version = fleet.version
+    if version_key(version) <= version_key(known_version):
+        return dash.no_update
+    return version
+
+
+# Varje figur, KPI-korten och tabellen har egna callbacks som körs parallellt, så en
+# långsam figur inte håller upp de andra. Finns figuren redan i webbläsaren skickas bara
+# nya data-arrayer via dash.Patch; layout, axlar och färgskalor ligger kvar.
+FIGURE_MARGIN = dict(l=20, r=20, t=40, b=20)
+SCATTER_HOVER = ["Name", "Flag", "Type"]
+
+
+def can_patch(figure, count=1):
+    """
+    True om figuren som redan visas har exakt `count` traces att patcha. Efter en
+    omladdning av datan byggs figurerna om helt, eftersom t.ex. axlarna kan ha ändrats.
+    """
+    if ctx.triggered_id == "data-version":
+        return False
+    return bool(figure) and len(figure.get("data", [])) == count
+
+
+def scatter_points(data, n):
+    rows = data.scatter_rows(n)
+    title = "Risk vs Age (Fixed Axis)"
+    if len(rows) < n:
+        title += f" - outliers + highest risk, {len(rows)} of {n}"
+    trace_type = "scattergl" if len(rows) > SCATTER_WEBGL_THRESHOLD else "scatter"
+    return data.df.iloc[rows], title, trace_type
+
 
-    # 1. Scatter Plot (LÅST AXEL)
+def scatter_sizeref(data):
+    """
+    Markörstorleken skalas mot hela datans största GT (som px gör med size_max), inte
+    mot urvalet som råkar visas, så att storlekarna stämmer när Patch byter punkter.
+    """
+    max_gt = float(data.max_gt)
+    if not np.isfinite(max_gt) or max_gt <= 0:
+        max_gt = 1.0
+    return 2.0 * max_gt / SCATTER_SIZE_MAX**2
+
+
+def scatter_figure(data, points, title, trace_type):
     fig_scat = px.scatter(
-        filtered_df,
+        points,
         x="Age",
         y="GT",
         color="Shadow_Probability",
         size="GT",
-        hover_data=["Name", "Flag", "Type"],
+        size_max=SCATTER_SIZE_MAX,
+        hover_data=SCATTER_HOVER,
         color_continuous_scale="RdYlGn_r",
         range_color=[0, 1],
-        title="Risk vs Age (Fixed Axis)",
+        title=title,
         template="plotly_white",
+        render_mode="webgl" if trace_type == "scattergl" else "svg",
     )
+    fig_scat.update_traces(marker=dict(sizemode="area", sizeref=scatter_sizeref(data)))
     # Här låser vi axlarna till de globala maxvärdena vi räknade ut i början
     fig_scat.update_layout(
-        margin=dict(l=20, r=20, t=40, b=20),
-        xaxis=dict(range=[0, MAX_AGE]),
-        yaxis=dict(range=[0, MAX_GT]),
+        margin=FIGURE_MARGIN,
+        xaxis=dict(range=[0, data.max_age]),
+        yaxis=dict(range=[0, data.max_gt]),
     )
+    return fig_scat
 
-    # 2. Bar Chart
-    if len(filtered_df) > 0:
-        flag_counts = filtered_df["Flag"].value_counts().nlargest(10).reset_index()
-        flag_counts.columns = ["Flag", "Count"]
-        fig_bar = px.bar(
-            flag_counts,
-            x="Flag",
-            y="Count",
-            title="Top 10 Flags",
-            template="plotly_white",
-            color="Count",
-            color_continuous_scale="Blues",
-        )
-    else:
-        fig_bar = px.bar(title="No Data")
-    fig_bar.update_layout(margin=dict(l=20, r=20, t=40, b=20))
-
-    # 3. Pie Chart
-    if len(filtered_df) > 0:
-        type_counts = filtered_df["Type"].value_counts()
-        if len(type_counts) > 7:
-            main_types = type_counts.nlargest(7).index
-            filtered_df["Type_Clean"] = filtered_df["Type"].apply(
-                lambda x: x if x in main_types else "Other"
-            )
-        else:
-            filtered_df["Type_Clean"] = filtered_df["Type"]
-        fig_pie = px.pie(
-            filtered_df,
-            names="Type_Clean",
-            title="Vessel Types",
-            hole=0.5,
-            template="plotly_white",
-        )
-    else:
-        fig_pie = px.pie(title="No Data")
-    fig_pie.update_layout(margin=dict(l=20, r=20, t=40, b=20))
-
-    # 4. Histogram (LÅST X-AXEL)
-    fig_hist = px.histogram(
-        filtered_df,
-        x="Shadow_Probability",
-        nbins=20,
-        title="Risk Score Distribution",
-        labels={"Shadow_Probability": "Risk Score"},
+
+def bar_figure(flag_counts):
+    fig_bar = px.bar(
+        x=flag_counts.index.tolist(),
+        y=flag_counts.to_numpy(),
+        labels={"x": "Flag", "y": "Count", "color": "Count"},
+        title="Top 10 Flags",
         template="plotly_white",
-        color_discrete_sequence=["#e74c3c"],
+        color=flag_counts.to_numpy(),
+        color_continuous_scale="Blues",
+    )
+    fig_bar.update_layout(margin=FIGURE_MARGIN)
+    return fig_bar
+
+
+def type_slices(type_counts):
+    """De 7 vanligaste typerna, resten summeras som 'Other'."""
+    if len(type_counts) > 7:
+        other = type_counts.iloc[7:].sum()
+        type_counts = pd.concat([type_counts.iloc[:7], pd.Series({"Other": other})])
+    return type_counts.index.tolist(), type_counts.to_numpy()
+
+
+def pie_figure(type_counts):
+    labels, values = type_slices(type_counts)
+    fig_pie = go.Figure(go.Pie(labels=labels, values=values, hole=0.5))
+    fig_pie.update_layout(
+        title="Vessel Types", template="plotly_white", margin=FIGURE_MARGIN
+    )
+    return fig_pie
+
+
+def hist_figure(hist_counts):
+    fig_hist = go.Figure(
+        go.Bar(
+            x=HIST_CENTERS,
+            y=hist_counts,
+            marker_color="#e74c3c",
+            hovertemplate="Risk Score=%{x:.3f}<br>count=%{y}<extra></extra>",
+        )
     )
     # Låser X-axeln till 0-1 så man ser var i skalan urvalet befinner sig
     fig_hist.update_layout(
-        margin=dict(l=20, r=20, t=40, b=20), xaxis=dict(range=[0, 1]), bargap=0.1
+        title="Risk Score Distribution",
+        template="plotly_white",
+        xaxis_title="Risk Score",
+        yaxis_title="count",
+        margin=FIGURE_MARGIN,
+        xaxis=dict(range=[0, 1]),
+        bargap=0.1,
     )
+    return fig_hist
 
-    # KPI Calculation
-    count = len(filtered_df)
-    avg_age = f"{filtered_df['Age'].mean():.1f} yrs" if count > 0 else "-"
-    avg_risk = f"{filtered_df['Shadow_Probability'].mean():.2f}" if count > 0 else "-"
-    dom_flag = filtered_df["Flag"].mode()[0] if count > 0 else "-"
 
-    return (
-        fig_scat,
-        fig_bar,
-        fig_pie,
-        fig_hist,
-        filtered_df.to_dict("records"),
-        f"{count}",
-        avg_age,
-        avg_risk,
-        dom_flag,
+def empty_figure():
+    return go.Figure(
+        layout=dict(title="No Data", template="plotly_white", margin=FIGURE_MARGIN)
     )
 
 
+@app.callback(
+    [
+        Output("kpi-count", "children"),
+        Output("kpi-age", "children"),
+        Output("kpi-risk", "children"),
+        Output("kpi-flag", "children"),
+    ],
+    [Input("risk-slider", "value"), Input("data-version", "data")],
+)
+def update_kpis(min_risk, version):
+    data = fleet_for(version)
+    summary = data.summary(data.prefix_len(min_risk))
+
+    count = summary["count"]
+    avg_age = f"{summary['avg_age']:.1f} yrs" if count > 0 else "-"
+    avg_risk = f"{summary['avg_risk']:.2f}" if count > 0 else "-"
+    dom_flag = summary["dom_flag"] if count > 0 else "-"
+
+    return f"{count}", avg_age, avg_risk, dom_flag
+
+
+@app.callback(
+    Output("scatter-plot", "figure"),
+    [Input("risk-slider", "value"), Input("data-version", "data")],
+    [State("scatter-plot", "figure")],
+)
+def update_scatter(min_risk, version, current):
+    # 1. Scatter Plot (LÅST AXEL, WebGL + nedsampling för stora urval)
+    data = fleet_for(version)
+    points, title, trace_type = scatter_points(data, data.prefix_len(min_risk))
+    if not can_patch(current):
+        return scatter_figure(data, points, title, trace_type)
+
+    patched = Patch()
+    patched["data"][0]["type"] = trace_type
+    patched["data"][0]["x"] = points["Age"].to_numpy()
+    patched["data"][0]["y"] = points["GT"].to_numpy()
+    patched["data"][0]["marker"]["color"] = points["Shadow_Probability"].to_numpy()
+    patched["data"][0]["marker"]["size"] = points["GT"].to_numpy()
+    patched["data"][0]["marker"]["sizemode"] = "area"
+    patched["data"][0]["marker"]["sizeref"] = scatter_sizeref(data)
+    patched["data"][0]["customdata"] = points[SCATTER_HOVER].to_numpy().tolist()
+    patched["layout"]["title"]["text"] = title
+    return patched
+
+
+@app.callback(
+    Output("bar-chart", "figure"),
+    [Input("risk-slider", "value"), Input("data-version", "data")],
+    [State("bar-chart", "figure")],
+)
+def update_bar(min_risk, version, current):
+    # 2. Bar Chart
+    data = fleet_for(version)
+    n = data.prefix_len(min_risk)
+    if n == 0:
+        return empty_figure()
+
+    flag_counts = data.summary(n)["flag_counts"].nlargest(10)
+    if not can_patch(current):
+        return bar_figure(flag_counts)
+
+    patched = Patch()
+    patched["data"][0]["x"] = flag_counts.index.tolist()
+    patched["data"][0]["y"] = flag_counts.to_numpy()
+    patched["data"][0]["marker"]["color"] = flag_counts.to_numpy()
+    return patched
+
+
+@app.callback(
+    Output("type-pie-chart", "figure"),
+    [Input("risk-slider", "value"), Input("data-version", "data")],
+    [State("type-pie-chart", "figure")],
+)
+def update_pie(min_risk, version, current):
+    # 3. Pie Chart (byggs från typräkningarna, inte från rådatan)
+    data = fleet_for(version)
+    n = data.prefix_len(min_risk)
+    if n == 0:
+        return empty_figure()
+
+    type_counts = data.summary(n)["type_counts"]
+    if not can_patch(current):
+        return pie_figure(type_counts)
+
+    labels, values = type_slices(type_counts)
+    patched = Patch()
+    patched["data"][0]["labels"] = labels
+    patched["data"][0]["values"] = values
+    return patched
+
+
+@app.callback(
+    Output("risk-histogram", "figure"),
+    [Input("risk-slider", "value"), Input("data-version", "data")],
+    [State("risk-histogram", "figure")],
+)
+def update_histogram(min_risk, version, current):
+    # 4. Histogram (LÅST X-AXEL, binnat på servern)
+    data = fleet_for(version)
+    hist_counts = data.summary(data.prefix_len(min_risk))["hist_counts"]
+    if not can_patch(current):
+        return hist_figure(hist_counts)
+
+    patched = Patch()
+    patched["data"][0]["y"] = hist_counts
+    return patched
+
+
+# Inputs som ger ett nytt urval; då börjar tabellen om på första sidan
+TABLE_RESET_INPUTS = {
+    "risk-slider.value",
+    "vessel-table.sort_by",
+    "vessel-table.filter_query",
+    "vessel-search.value",
+    "flag-filter.value",
+    "type-filter.value",
+}
+
+
+def sorted_page(rank, start, stop):
+    """
+    Platserna (i `rank`) för raderna start:stop när de sorteras på rank. Bara de stop
+    första behöver sorteras, resten delas av med argpartition.
+    """
+    if 0 < stop < len(rank):
+        top = np.argpartition(rank, stop - 1)[:stop]
+    else:
+        top = np.arange(len(rank))
+    return top[np.argsort(rank[top])][start:stop]
+
+
+@app.callback(
+    [
+        Output("vessel-table", "data"),
+        Output("vessel-table", "page_count"),
+        Output("vessel-table", "page_current"),
+    ],
+    [
+        Input("risk-slider", "value"),
+        Input("vessel-table", "page_current"),
+        Input("vessel-table", "page_size"),
+        Input("vessel-table", "sort_by"),
+        Input("vessel-table", "filter_query"),
+        Input("vessel-search", "value"),
+        Input("flag-filter", "value"),
+        Input("type-filter", "value"),
+        Input("data-version", "data"),
+    ],
+)
+def update_table(
+    min_risk,
+    page_current,
+    page_size,
+    sort_by,
+    filter_query,
+    query,
+    flags,
+    types,
+    version,
+):
+    # Rader över tröskeln är ett prefix av data.df (sorterad på risk)
+    data = fleet_for(version)
+    n = data.prefix_len(min_risk)
+    matches = data.search(query or "", tuple(flags or ()), tuple(types or ()))
+
+    # rows = urvalets radpositioner, None för hela prefixet (behöver aldrig byggas)
+    if matches is not None:
+        # Sökträffarna (i relevansordning) under tröskeln; bara de filtreras och sorteras
+        rows = matches[matches < n]
+        if filter_query:
+            rows = rows[filter_mask(data.df.iloc[rows], filter_query)]
+    elif filter_query:
+        rows = np.flatnonzero(filter_mask(data.df.iloc[:n], filter_query))
+    else:
+        rows = None
+    count = n if rows is None else len(rows)
+
+    # Nytt urval -> första sidan; annars stannar sidan inom urvalet (t.ex. efter en omladdning)
+    page_size = page_size or 15
+    page_count = max(math.ceil(count / page_size), 1)
+    if TABLE_RESET_INPUTS & set(ctx.triggered_prop_ids):
+        page_current = 0
+    page_current = min(page_current or 0, page_count - 1)
+    start = page_current * page_size
+    stop = min(start + page_size, count)
+
+    # Skicka bara den synliga sidan
+    if sort_by:
+        sort_col = SORT_ALIASES.get(sort_by[0]["column_id"], sort_by[0]["column_id"])
+        rank = data.sort_rank[(sort_col, sort_by[0]["direction"])]
+        if rows is None:
+            page_rows = sorted_page(rank[:n], start, stop)
+        else:
+            page_rows = rows[sorted_page(rank[rows], start, stop)]
+    elif rows is None:
+        page_rows = np.arange(start, stop)
+    else:
+        page_rows = rows[start:stop]
+
+    page_df = data.df.iloc[page_rows][TABLE_COLUMNS]
+    page_df = page_df.assign(MT_Link=mt_link(page_df["IMO"]))
+
+    return page_df.to_dict("records"), page_count, page_current
+
+
+def run_production(bind, workers):
+    """
+    Kör dashboarden med gunicorn och `workers` processer. Datan är redan inläst här
+    (preload_app), så processerna forkas med delade copy-on-write-sidor istället för
+    att läsa in datan var för sig. På Windows, där gunicorn saknas, används waitress
+    med en tråd per worker.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        try:
+            from waitress import serve
+        except ImportError:
+            sys.exit(
+                "--prod needs gunicorn or, on Windows, waitress: pip install waitress"
+            )
+
+        host, port = bind.rsplit(":", 1)
+        serve(server, host=host, port=int(port), threads=workers)
+        return
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            return server
+
+    # Se pre_fork i gunicorn.conf.py
+    gc.freeze()
+    DashboardApplication().run()
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Shadow Fleet Intelligence Dashboard")
+    parser.add_argument(
+        "--prod", action="store_true", help="production server instead of debug mode"
+    )
+    parser.add_argument("--bind", default="0.0.0.0:8050")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 4))
+    )
+    args = parser.parse_args()
+
+    if args.prod:
+        run_production(args.bind, args.workers)
+    else:
+        app.run(debug=True)
@@ -0,0 +1,303 @@
+"""
+Benchmarks för pipelinen och dashboarden på syntetiska flottor (synthetic_fleet.py).
+
+Per storlek (8k, 80k, 800k rader) mäts:
+- load_and_clean från CSV:n och från kolumnfilen (.arrow), och bygget av kolumnfilen
+- model_building på de riktiga skuggfartygen + den syntetiska flottan
+- model_prediction med tom och med varm featurecache, och FastForest-exporten
+- load_vessels och FleetIndex (dashboardens uppstart), och sökningen i tabellen
+- varje dashboard-callback vid flera tröskelvärden, via Dash egen HTTP-endpoint:
+  tid och svarets storlek i bytes, dels hela figurer (första visningen), dels
+  Patch-svaren när slidern flyttas från en figur som redan visas
+
+Resultatet skrivs som JSON (metadata + en post per mätning), så att körningar från
+olika versioner kan jämföras. Körs från projektets rot:
+
+    python benchmarks/run_benchmarks.py --sizes 8k 80k
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [ROOT, os.path.join(ROOT, "model"), BENCH_DIR]
+
+# Ingen bevakningstråd i app.py och inga fönster från matplotlib
+os.environ.setdefault("SHADOW_FLEET_RELOAD_INTERVAL", "0")
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import dash
+import numpy as np
+import pandas as pd
+import sklearn
+
+import app
+import feature_cache
+from first_sort import (
+    FEATURES,
+    SHADOW_FILE,
+    default_params,
+    load_and_clean,
+    model_building,
+    model_prediction,
+)
+from fleet_store import ensure_store
+from forest_export import export_forest
+from model_store import load_model
+from synthetic_fleet import FLEET_SIZES, generate_fleet
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+THRESHOLDS = [0.0, 0.25, 0.5, 0.75, 0.9]
+REPEAT = 3  # körningar per mätning av de snabba stegen, medianen rapporteras
+SLIDER_STEP = 0.01  # Patch-mätningen flyttar slidern ett steg
+
+# Tabellens övriga inputs, som i layouten
+TABLE_INPUTS = {
+    "page_current": 0,
+    "page_size": 15,
+    "sort_by": [],
+    "filter_query": "",
+}
+# Sökrutan och flagg-/typfiltren är tomma, som när sidan laddas
+SEARCH_INPUTS = {
+    ("vessel-search", "value"): "",
+    ("flag-filter", "value"): [],
+    ("type-filter", "value"): [],
+}
+
+
+def timed(fn, repeat: int = 1):
+    """Kör fn repeat gånger. Returnerar (sekunder per körning, sista resultatet)."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def run_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "dash": dash.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def parse_outputs(output: str):
+    """callback_map-nyckeln -> outputs som Dash renderer skickar dem."""
+    if not output.startswith(".."):
+        component, prop = output.rsplit(".", 1)
+        return {"id": component, "property": prop}
+    return [
+        dict(zip(("id", "property"), part.rsplit(".", 1)))
+        for part in output.strip(".").split("...")
+    ]
+
+
+def callback_body(output: str, spec: dict, threshold: float, version, state=None):
+    """Samma request som webbläsaren skickar när risk-slidern flyttas."""
+    values = {("risk-slider", "value"): threshold, ("data-version", "data"): version}
+    values.update({("vessel-table", prop): v for prop, v in TABLE_INPUTS.items()})
+    values.update(SEARCH_INPUTS)
+    return {
+        "output": output,
+        "outputs": parse_outputs(output),
+        "inputs": [
+            {**i, "value": values[(i["id"], i["property"])]} for i in spec["inputs"]
+        ],
+        "state": [{**s, "value": state} for s in spec.get("state", [])],
+        "changedPropIds": ["risk-slider.value"],
+    }
+
+
+def call(client, body: dict) -> bytes:
+    response = client.post("/_dash-update-component", json=body)
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{body['output']}: HTTP {response.status_code}")
+    return response.data
+
+
+def bench_callbacks(fleet, thresholds: list[float], repeat: int):
+    """(steg, tröskel, sekunder per körning, bytes i svaret) per callback och tröskel."""
+    client = app.server.test_client()
+    for output, spec in app.app.callback_map.items():
+        name = spec["callback"].__name__
+        if name == "check_data_version":
+            continue  # bevakningen av filerna, inte slidern
+        for threshold in thresholds:
+            body = callback_body(output, spec, threshold, fleet.version)
+            runs, payload = timed(lambda: call(client, body), repeat)
+            yield f"callback:{name}", threshold, runs, len(payload)
+
+            if not spec.get("state"):
+                continue
+            # Figuren som nu visas är state när slidern flyttas vidare -> Patch
+            target = parse_outputs(output)
+            figure = json.loads(payload)["response"][target["id"]][target["property"]]
+            moved = round(min(threshold + SLIDER_STEP, 1.0), 2)
+            body = callback_body(output, spec, moved, fleet.version, state=figure)
+            runs, payload = timed(lambda: call(client, body), repeat)
+            yield f"callback_patch:{name}", moved, runs, len(payload)
+
+
+def bench_size(
+    label: str, thresholds: list[float], repeat: int, n_jobs: int, train: bool
+) -> list[dict]:
+    n_rows = FLEET_SIZES[label]
+    results = []
+
+    def record(stage, runs, threshold=None, payload_bytes=None, **extra):
+        results.append(
+            {
+                "size": label,
+                "rows": n_rows,
+                "stage": stage,
+                "threshold": threshold,
+                "seconds": statistics.median(runs),
+                "runs": [round(r, 6) for r in runs],
+                "payload_bytes": payload_bytes,
+                **extra,
+            }
+        )
+        at = "" if threshold is None else f"@{threshold:g}"
+        print(f"{label:>5} {stage + at:<36} {statistics.median(runs):9.4f} s")
+
+    tmp_dir = tempfile.mkdtemp(prefix=f"shadow_fleet_bench_{label}_")
+    cache_dir = feature_cache.FEATURE_CACHE_DIR
+    try:
+        # Egen featurecache för träningen, så att projektets cache lämnas orörd
+        feature_cache.FEATURE_CACHE_DIR = os.path.join(tmp_dir, "feature_cache")
+        csv_path = os.path.join(tmp_dir, "unknown_vessels.csv")
+        generate_fleet(n_rows).to_csv(csv_path, index=False)
+
+        runs, unknown_df = timed(lambda: load_and_clean(csv_path, 0), repeat)
+        record("load_and_clean:csv", runs)
+        runs, store = timed(lambda: ensure_store(csv_path))
+        record("ensure_store", runs)
+        runs, unknown_df = timed(lambda: load_and_clean(store, 0), repeat)
+        record("load_and_clean:arrow", runs)
+
+        if train:
+            shadow_df = load_and_clean(ensure_store(SHADOW_FILE), 1)
+            train_df = pd.concat([shadow_df, unknown_df])
+            params = {**default_params(), "n_jobs": n_jobs}
+            runs, model = timed(lambda: model_building(train_df, FEATURES, params))
+            record("model_building", runs, train_rows=len(train_df))
+        else:
+            model, _ = load_model()
+            if model is None:
+                raise SystemExit("Ingen sparad modell, kör utan --no-train.")
+
+        # model_prediction lägger till en kolumn, så den får en kopia varje gång
+        runs, scored = timed(
+            lambda: model_prediction(unknown_df.copy(), FEATURES, model, n_jobs),
+            repeat,
+        )
+        record("model_prediction", runs)
+
+        forest = export_forest(model)
+        runs, _ = timed(lambda: forest.predict_proba(unknown_df[FEATURES]), repeat)
+        record("forest_predict", runs)
+
+        score_path = os.path.join(tmp_dir, "vessels_with_score.csv")
+        scored.to_csv(score_path, index=False)
+        runs, vessels = timed(lambda: app.load_vessels(score_path))
+        record("load_vessels", runs)
+
+        def build_index():
+            # Samma versionsformat som dashboarden (filernas mtime)
+            version = app.data_version((os.path.getmtime(score_path),))
+            index = app.FleetIndex(vessels, version=version)
+            index.warm_up()
+            return index
+
+        runs, fleet = timed(build_index)
+        record("fleet_index", runs)
+
+        # Sökrutan: namn + flagga + tröskel, utan cache (som en ny sökning)
+        vessel = fleet.df.iloc[len(fleet.df) // 2]
+        query, flags = str(vessel["Name"]), (str(vessel["Flag"]),)
+        for threshold in thresholds:
+            n = fleet.prefix_len(threshold)
+
+            def search():
+                rows = fleet._search(query, flags)
+                return rows[rows < n]
+
+            runs, _ = timed(search, repeat)
+            record("fleet_search", runs, threshold=threshold)
+
+        # Callbackarna läser den globala fleet, som vid en omladdning
+        app.fleet = fleet
+        for stage, threshold, runs, payload in bench_callbacks(
+            fleet, thresholds, repeat
+        ):
+            record(stage, runs, threshold=threshold, payload_bytes=payload)
+    finally:
+        feature_cache.FEATURE_CACHE_DIR = cache_dir
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shadow Fleet benchmarks")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=FLEET_SIZES, default=list(FLEET_SIZES)
+    )
+    parser.add_argument("--thresholds", nargs="+", type=float, default=THRESHOLDS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument(
+        "--no-train",
+        action="store_true",
+        help="hoppa över model_building och poängsätt med den sparade modellen",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="JSON-fil att skriva (standard: benchmarks/results/bench_<tid>.json)",
+    )
+    args = parser.parse_args()
+
+    report = {"meta": run_info(), "results": []}
+    for label in args.sizes:
+        report["results"] += bench_size(
+            label, args.thresholds, args.repeat, args.n_jobs, not args.no_train
+        )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench_{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Skrev {len(report['results'])} mätningar till {output}")
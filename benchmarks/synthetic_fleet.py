@@ -0,0 +1,71 @@
+"""
+Syntetiska fartygstabeller i samma format som vessel_data/unknown_vessels.csv
+(IMO, Name, Type, Flag, Built, GT, DWT, Size) för benchmarks.
+
+Raderna dras med återläggning ur den riktiga filen, så att fördelningen av flaggor,
+typer, ålder och storlek blir realistisk, och storlekarna skakas om lite så att
+kopiorna inte blir identiska. IMO-numren är unika och namnen påhittade.
+
+    python benchmarks/synthetic_fleet.py 80k -o /tmp/fleet_80k.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SOURCE_FILE = "vessel_data/unknown_vessels.csv"
+FLEET_SIZES = {"8k": 8_000, "80k": 80_000, "800k": 800_000}
+CURRENT_YEAR = 2026  # nyaste byggåret i skrapningen
+
+
+def generate_fleet(
+    n_rows: int, seed: int = 42, source_file: str = SOURCE_FILE
+) -> pd.DataFrame:
+    """n_rows syntetiska fartyg i samma schema som source_file."""
+    source = pd.read_csv(source_file)
+    rng = np.random.default_rng(seed)
+    fleet = source.sample(n=n_rows, replace=True, random_state=seed).reset_index(
+        drop=True
+    )
+
+    # Unika 7-siffriga IMO-nummer och påhittade namn
+    fleet["IMO"] = 1_000_000 + rng.permutation(9_000_000)[:n_rows]
+    fleet["Name"] = [f"SYNTHETIC {i}" for i in range(n_rows)]
+
+    # Byggår +-2 år, tonnage och mått +-10 %; saknade värden förblir saknade
+    built = pd.to_numeric(fleet["Built"], errors="coerce")
+    fleet["Built"] = (built + rng.integers(-2, 3, n_rows)).clip(upper=CURRENT_YEAR)
+    fleet["Built"] = fleet["Built"].astype("Int64")
+    scale = rng.lognormal(0, 0.1, n_rows)
+    for col in ["GT", "DWT"]:
+        values = pd.to_numeric(fleet[col], errors="coerce") * scale
+        fleet[col] = values.round().astype("Int64")
+
+    size = fleet["Size"].astype("string").str.split("/", n=1, expand=True)
+    size = size.reindex(columns=[0, 1])
+    length = (pd.to_numeric(size[0], errors="coerce") * scale).round()
+    width = (pd.to_numeric(size[1], errors="coerce") * np.sqrt(scale)).round()
+    fleet["Size"] = (
+        length.astype("Int64").astype("string")
+        + " / "
+        + width.astype("Int64").astype("string")
+    )
+    # Saknas något av måtten står Size som "-", som i skrapningen
+    fleet["Size"] = fleet["Size"].fillna("-")
+
+    return fleet[source.columns]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Syntetisk fartygsdata")
+    parser.add_argument("size", choices=FLEET_SIZES, help="antal rader")
+    parser.add_argument("-o", "--output", required=True, help="CSV-fil att skriva")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = generate_fleet(FLEET_SIZES[args.size], args.seed)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    fleet.to_csv(args.output, index=False)
+    print(f"Skrev {len(fleet)} fartyg till {args.output}")
@@ -0,0 +1,23 @@
+"""
+gunicorn-konfiguration för dashboarden:
+
+    gunicorn -c gunicorn.conf.py app:server
+
+Datan läses in en gång i master-processen (preload_app) och delas med workers via
+copy-on-write. Antal workers styrs med WEB_CONCURRENCY.
+"""
+
+import gc
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+preload_app = True
+timeout = 60
+
+
+def pre_fork(server, worker):
+    # Flytta alla inlästa objekt ur GC:ns generationer, annars skriver GC:n till
+    # objekthuvudena i barnprocesserna och de delade sidorna kopieras ändå
+    gc.freeze()
@@ -0,0 +1,107 @@
+"""
+Innehållsadresserad cache för preprocessingen (imputering + one-hot av Type/Flag).
+
+Designmatrisen sparas som gles .npz och den tränade preprocessorn som .joblib i
+FEATURE_CACHE_DIR. Nyckeln är en hash av indatan (raderna, kolumnerna och deras typer)
+och av preprocessorn själv (inställningar, och för en tränad preprocessor även det den
+lärt sig), så samma indata med samma preprocessor aldrig kodas om. Cachen används vid
+träning och sensitivity-utvärdering, där samma data kodas om körning efter körning;
+poängsättning av ny indata går förbi den (en ny fil skulle bara skrivas och aldrig läsas):
+- fit_transform(): träningsdatan -> (tränad preprocessor, designmatris)
+- transform(): valfri data genom en tränad preprocessor -> designmatris
+"""
+
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import sklearn
+
+from process_utils import atomic_write
+
+FEATURE_CACHE_DIR = "model/feature_cache"
+FEATURE_CACHE_MAX_FILES = 40  # äldsta filerna tas bort när cachen växer förbi detta
+
+
+def frame_hash(X: pd.DataFrame) -> str:
+    """Hash av en tabells innehåll, kolumner och typer (inte index)."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(repr([(col, str(dtype)) for col, dtype in X.dtypes.items()]).encode())
+    return h.hexdigest()
+
+
+def _cache_key(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in (*parts, sklearn.__version__):
+        h.update(part.encode())
+    return h.hexdigest()[:32]
+
+
+def _matrix_path(key: str, sparse: bool) -> str:
+    return os.path.join(FEATURE_CACHE_DIR, key + (".npz" if sparse else ".npy"))
+
+
+def _load_matrix(key: str):
+    """Designmatrisen för key, eller None om den inte finns i cachen."""
+    if os.path.exists(_matrix_path(key, True)):
+        return sp.load_npz(_matrix_path(key, True))
+    if os.path.exists(_matrix_path(key, False)):
+        return np.load(_matrix_path(key, False))
+    return None
+
+
+def _save_matrix(key: str, matrix) -> None:
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    sparse = sp.issparse(matrix)
+    with atomic_write(_matrix_path(key, sparse), "wb") as f:
+        if sparse:
+            sp.save_npz(f, matrix, compressed=False)
+        else:
+            np.save(f, matrix)
+
+
+def _prune() -> None:
+    paths = [
+        os.path.join(FEATURE_CACHE_DIR, name) for name in os.listdir(FEATURE_CACHE_DIR)
+    ]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:-FEATURE_CACHE_MAX_FILES]:
+        os.remove(path)
+
+
+def fit_transform(preprocessor, X: pd.DataFrame):
+    """
+    Som preprocessor.fit_transform(X), men från cachen om samma (otränade) preprocessor
+    redan tränats på samma data. Returnerar (tränad preprocessor, designmatris).
+    """
+    key = _cache_key("fit", frame_hash(X), joblib.hash(preprocessor))
+    fitted_path = os.path.join(FEATURE_CACHE_DIR, key + ".joblib")
+
+    matrix = _load_matrix(key)
+    if matrix is not None and os.path.exists(fitted_path):
+        return joblib.load(fitted_path), matrix
+
+    matrix = preprocessor.fit_transform(X)
+    _save_matrix(key, matrix)
+    with atomic_write(fitted_path, "wb") as f:
+        joblib.dump(preprocessor, f)
+    _prune()
+    return preprocessor, matrix
+
+
+def transform(preprocessor, X: pd.DataFrame):
+    """Som preprocessor.transform(X), men från cachen om samma data redan kodats."""
+    key = _cache_key("transform", frame_hash(X), joblib.hash(preprocessor))
+
+    matrix = _load_matrix(key)
+    if matrix is not None:
+        return matrix
+
+    matrix = preprocessor.transform(X)
+    _save_matrix(key, matrix)
+    _prune()
+    return matrix
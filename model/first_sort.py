@@ -1,14 +1,43 @@
 import pandas as pd
 import numpy as np
+import argparse
 import json
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import OneHotEncoder
+import heapq
+import os
+import pickle
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import average_precision_score
+from sklearn.model_selection import (
+    HalvingRandomSearchCV,
+    StratifiedKFold,
+    train_test_split,
+)
+from sklearn.inspection import permutation_importance
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 from sklearn.utils import resample
-import matplotlib.pyplot as plt
-import seaborn as sns
+from fleet_store import (
+    STORE_SUFFIX,
+    ensure_store,
+    prepare_frame,
+    read_store,
+    store_available,
+    store_path,
+    write_store,
+    load_fleet,
+)
+from model_store import check_schema, load_model, save_model, training_hash
+from forest_export import FOREST_FILE, export_forest
+from process_utils import atomic_write
+from profiling import PROFILERS, StageTimer, profiled
+from snapshot_store import history_features, join_history_features
+import feature_cache
 
 # --- FILNAMN ---
 SHADOW_FILE = (
@@ -16,15 +45,91 @@ SHADOW_FILE = (
 )
 UNKNOWN_FILE = "vessel_data/unknown_vessels.csv"  # ca 80000 okända tankerfartyg
 OUTPUT_FILE = "vessels_with_score.csv"
+METRICS_FILE = "model_metrics.json"
+
+FEATURES = ["Type", "Flag", "Built", "DWT", "Length"]
+RF_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 12,
+    "class_weight": "balanced",
+    "random_state": 42,
+    "oob_score": True,
+    "n_jobs": -1,  # alla kärnor, påverkar inte resultatet
+}
+# Kodning av de kategoriska featurerna (--encoding):
+# - onehot: en kolumn per nivå (gles matris) + random forest, som tidigare
+# - ordinal: en heltalskolumn per feature + random forest
+# - native: en heltalskolumn per feature + HistGradientBoosting med inbyggt stöd för kategorier
+# Nivåer med färre än RARE_LEVEL_MIN_COUNT fartyg slås ihop till en "ovanlig"-nivå
+# i ordinal/native, så matrisen växer inte med antalet flaggor, ägare etc.
+ENCODINGS = ["onehot", "ordinal", "native"]
+ENCODING = "onehot"
+RARE_LEVEL_MIN_COUNT = 10
+HGB_PARAMS = {
+    "max_iter": 500,
+    "learning_rate": 0.05,
+    "class_weight": "balanced",
+    "random_state": 42,
+    # 10 % av träningsdatan hålls utanför, motsvarar OOB-scoren för skogen
+    "early_stopping": True,
+    "scoring": "accuracy",
+    "validation_fraction": 0.1,
+    "n_iter_no_change": 30,
+}
+ENCODING_REPORT_FILE = "model/encoding_report.json"
+
+# Hyperparametersökning (tune): slumpade kombinationer utvärderas med stratifierad
+# korsvalidering, och successive halving ger bara de bästa fler träningsrader per varv.
+# Bästa parametrarna sparas i TUNED_PARAMS_FILE och används av train från och med då.
+TUNED_PARAMS_FILE = "model/tuned_params.json"
+TUNING_SPACE = {
+    "classifier__n_estimators": [100, 200, 300, 500],
+    "classifier__max_depth": [8, 12, 16, 24, None],
+    "classifier__min_samples_leaf": [1, 2, 5, 10],
+    "classifier__max_features": ["sqrt", "log2", 0.3, 0.5],
+    "classifier__class_weight": ["balanced", "balanced_subsample"],
+}
+TUNING_CANDIDATES = 60
+TUNING_FOLDS = 5
+TUNING_FACTOR = 3  # en tredjedel av kombinationerna går vidare till nästa varv
+TUNING_SCORING = "average_precision"  # obalanserade klasser, accuracy säger lite
+
+# Rader per predict_proba-anrop, håller minnet per chunk begränsat
+SCORING_CHUNK_SIZE = 50_000
+
+# Streaming: alla poängsatta rader skrivs till STREAM_OUTPUT_FILE medan bara de
+# STREAM_TOP_K mest riskfyllda hålls i minnet (och sparas till OUTPUT_FILE)
+STREAM_OUTPUT_FILE = "vessel_data/scored_stream.csv"
+STREAM_TOP_K = 50_000
+
+# Hash per fartyg av dess features (saltad med modellens hash), sparas i OUTPUT_FILE.
+# Inkrementell körning poängsätter bara rader vars fingeravtryck är nytt.
+FINGERPRINT_COLUMN = "Fingerprint"
 
 
 def load_and_clean(filepath, label: int) -> pd.DataFrame:
     """Laddar data och säkerställer rätt format på features."""
-    df = pd.read_csv(filepath)
-
-    # Dela upp size
-    df[["Length", "Width"]] = df["Size"].str.split("/", expand=True)
-    df = df.drop("Size", axis=1)
+    if filepath.endswith(STORE_SUFFIX):
+        # Kolumnfilen är redan typad och städad (se fleet_store.prepare_frame)
+        df = read_store(filepath)
+        df["is_shadow"] = label
+    else:
+        df = clean_frame(pd.read_csv(filepath), label)
+
+    # Flagg- och namnbyten från skrapningshistoriken, om den finns (snapshot_store.py)
+    return join_history_features(df)
+
+
+def clean_frame(df: pd.DataFrame, label: int) -> pd.DataFrame:
+    """Städar en redan inläst tabell (eller chunk) på samma sätt som load_and_clean."""
+    # Dela upp size (finns inte om datan redan är städad)
+    # (en chunk kan sakna "/" helt, t.ex. bara "-" eller tomma värden)
+    if "Size" in df.columns:
+        size = df["Size"].astype("string").str.split("/", n=1, expand=True)
+        size = size.reindex(columns=[0, 1])
+        df["Length"] = pd.to_numeric(size[0], errors="coerce").astype("float64")
+        df["Width"] = pd.to_numeric(size[1], errors="coerce").astype("float64")
+        df = df.drop("Size", axis=1)
 
     # Konvertera numeriska värden
     df["Built"] = pd.to_numeric(df["Built"], errors="coerce")
@@ -34,6 +139,8 @@ def load_and_clean(filepath, label: int) -> pd.DataFrame:
     df["Width"] = pd.to_numeric(df["Width"], errors="coerce")
 
     # Slår ihop "-" och "Unknown"
+    if isinstance(df["Flag"].dtype, pd.CategoricalDtype):
+        df["Flag"] = df["Flag"].astype(object)
     df["Flag"] = df["Flag"].replace("-", "Unknown")
 
     # Sätt label
@@ -60,7 +167,7 @@ def exploratory_data_analysis(df: pd.DataFrame):
     print(df.isna().sum())
 
     # Kategoriska kolumner
-    cat_cols = df.select_dtypes(include="object").columns
+    cat_cols = df.select_dtypes(exclude="number").columns
     for col in cat_cols:
         print(f"\nValue counts for {col}:")
         print(df[col].value_counts(normalize=True))
@@ -71,11 +178,21 @@ def exploratory_data_analysis(df: pd.DataFrame):
     print(df[num_cols].describe())
 
 
-def feature_selection(df: pd.DataFrame) -> None:
+def feature_selection(df: pd.DataFrame, headless: bool = False) -> None:
 
     ### Korrelation för numeriska cols
     num_cols = df.select_dtypes(include="number").columns.drop("is_shadow")
     corr_matrix = df[num_cols].corr()
+    if headless:
+        # Batchkörning: matrisen skrivs ut istället för en plot som blockerar
+        print("\nCorrelation matrix:")
+        print(corr_matrix.round(2))
+        return
+
+    # Importeras först här, så att headless-körningar slipper matplotlib och seaborn
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     sns.heatmap(corr_matrix, annot=True, cmap="coolwarm")
 
     plt.show()  # VISAR PÅ LÅG KORRELATION FÖRUTOM MELLAN STORLEKSVARIABLERINA GT, DWT, LENGTH & WIDTH -> VI BESLUTAR ATT TA BORT WITDH OCH GT.
@@ -85,6 +202,8 @@ def feature_evaluation(df: pd.DataFrame, model: Pipeline) -> pd.DataFrame:
 
     ### Importance för olika variabler i modellen
     rf = model.named_steps["classifier"]
+    if not hasattr(rf, "feature_importances_"):
+        return permutation_feature_evaluation(df, model)
     feat_names = model.named_steps["preprocessor"].get_feature_names_out()
     importances = rf.feature_importances_
 
@@ -101,18 +220,53 @@ def feature_evaluation(df: pd.DataFrame, model: Pipeline) -> pd.DataFrame:
     return feat_imp_df
 
 
-def model_building(train_df: pd.DataFrame, features: list[str]) -> Pipeline:
-    X_train = train_df[features]
-    y_train = train_df["is_shadow"]
+def permutation_feature_evaluation(df: pd.DataFrame, model: Pipeline) -> pd.DataFrame:
+    ### HistGradientBoosting saknar feature_importances_: permutation importance istället,
+    ### normaliserad så att den summerar till 1 som skogens
+    features = model.feature_names_in_.tolist()
+    result = permutation_importance(
+        model, df[features], df["is_shadow"], n_repeats=3, random_state=42
+    )
+    importances = np.clip(result.importances_mean, 0, None)
+    if importances.sum() > 0:
+        importances = importances / importances.sum()
+
+    feat_imp_df = pd.DataFrame({"feature": features, "importance": importances})
+    return feat_imp_df.sort_values(by="importance", ascending=False)
+
+
+def default_params(encoding: str = ENCODING) -> dict:
+    return HGB_PARAMS if encoding == "native" else RF_PARAMS
 
+
+def build_pipeline(
+    X_train: pd.DataFrame, params: dict = RF_PARAMS, encoding: str = ENCODING
+) -> Pipeline:
+    ### Otränad pipeline: imputering + kodning (se ENCODINGS) följt av klassificeraren
     num_cols = X_train.select_dtypes(include="number").columns.tolist()
-    cat_cols = X_train.select_dtypes(include="object").columns.tolist()
+    cat_cols = X_train.select_dtypes(exclude="number").columns.tolist()
+
+    if encoding == "onehot":
+        encoder = ("onehot", OneHotEncoder(handle_unknown="ignore"))
+    else:
+        # Okända nivåer blir -1, som HistGradientBoosting behandlar som saknat värde
+        encoder = (
+            "ordinal",
+            OrdinalEncoder(
+                handle_unknown="use_encoded_value",
+                unknown_value=-1,
+                min_frequency=RARE_LEVEL_MIN_COUNT,
+            ),
+        )
 
-    num_transformer = SimpleImputer(strategy="median")
+    # HistGradientBoosting hanterar saknade värden själv
+    num_transformer = (
+        "passthrough" if encoding == "native" else SimpleImputer(strategy="median")
+    )
     cat_transformer = Pipeline(
         steps=[
             ("imputer", SimpleImputer(strategy="constant", fill_value="Unknown")),
-            ("onehot", OneHotEncoder(handle_unknown="ignore")),
+            encoder,
         ]
     )
 
@@ -123,32 +277,276 @@ def model_building(train_df: pd.DataFrame, features: list[str]) -> Pipeline:
         ]
     )
 
+    if encoding == "native":
+        classifier = HistGradientBoostingClassifier(
+            categorical_features=[False] * len(num_cols) + [True] * len(cat_cols),
+            **params,
+        )
+    else:
+        classifier = RandomForestClassifier(**params)
+
     rf_model = Pipeline(
         steps=[
             ("preprocessor", preprocessor),
-            (
-                "classifier",
-                RandomForestClassifier(
-                    n_estimators=300,
-                    max_depth=12,
-                    class_weight="balanced",
-                    random_state=42,
-                    oob_score=True,
-                ),
-            ),
+            ("classifier", classifier),
         ]
     )
 
-    rf_model.fit(X_train, y_train)
+    return rf_model
+
+
+def set_n_jobs(model, n_jobs: int) -> None:
+    # Skogen har n_jobs; HistGradientBoosting använder alltid OpenMP-trådar
+    classifier = (
+        model.named_steps["classifier"] if isinstance(model, Pipeline) else model
+    )
+    if "n_jobs" in classifier.get_params():
+        classifier.set_params(n_jobs=n_jobs)
+
+
+def model_building(
+    train_df: pd.DataFrame,
+    features: list[str],
+    params: dict = RF_PARAMS,
+    encoding: str = ENCODING,
+) -> Pipeline:
+    X_train = train_df[features]
+    y_train = train_df["is_shadow"]
+
+    rf_model = build_pipeline(X_train, params, encoding)
+
+    # Samma steg som rf_model.fit, men designmatrisen hämtas från cachen om den finns
+    preprocessor, X_encoded = feature_cache.fit_transform(
+        rf_model.named_steps["preprocessor"], X_train
+    )
+    rf_model.set_params(preprocessor=preprocessor)
+    rf_model.named_steps["classifier"].fit(X_encoded, y_train)
 
     return rf_model
 
 
+def hyperparameter_search(
+    train_df: pd.DataFrame,
+    features: list[str],
+    n_jobs: int = -1,
+    n_candidates: int = TUNING_CANDIDATES,
+) -> dict:
+    """
+    Successive halving över TUNING_SPACE. Kombinationerna körs parallellt (n_jobs),
+    varje skog på en kärna. Returnerar bästa parametrarna, resultaten och tidsåtgången.
+    """
+    X_train = train_df[features]
+    y_train = train_df["is_shadow"]
+
+    # Ingen OOB under sökningen, korsvalideringen mäter kvaliteten
+    base_params = {**RF_PARAMS, "oob_score": False, "n_jobs": 1}
+    search = HalvingRandomSearchCV(
+        build_pipeline(X_train, base_params),
+        TUNING_SPACE,
+        n_candidates=n_candidates,
+        factor=TUNING_FACTOR,
+        min_resources="exhaust",  # sista varvet tränar på all data
+        cv=StratifiedKFold(TUNING_FOLDS, shuffle=True, random_state=42),
+        scoring=TUNING_SCORING,
+        refit=False,
+        n_jobs=n_jobs,
+        random_state=42,
+    )
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(search.cv_results_)
+    last_round = results[results["iter"] == results["iter"].max()]
+    top = last_round.sort_values("rank_test_score").head(10)
+
+    return {
+        "best_params": {
+            key.removeprefix("classifier__"): value
+            for key, value in search.best_params_.items()
+        },
+        "best_score": float(search.best_score_),
+        "scoring": TUNING_SCORING,
+        "cv_folds": TUNING_FOLDS,
+        "n_candidates": int(search.n_candidates_[0]),
+        "rounds": [
+            {"candidates": int(c), "samples": int(r)}
+            for c, r in zip(search.n_candidates_, search.n_resources_)
+        ],
+        "fits": int(results.shape[0] * TUNING_FOLDS),
+        "elapsed_seconds": round(elapsed, 1),
+        "top_candidates": [
+            {
+                "params": {
+                    key.removeprefix("classifier__"): value
+                    for key, value in row["params"].items()
+                },
+                "mean_score": float(row["mean_test_score"]),
+                "std_score": float(row["std_test_score"]),
+                "mean_fit_seconds": float(row["mean_fit_time"]),
+            }
+            for _, row in top.iterrows()
+        ],
+    }
+
+
+def matrix_bytes(X) -> int:
+    if hasattr(X, "indptr"):  # gles CSR/CSC
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return np.asarray(X).nbytes
+
+
+def encoding_report(
+    train_df: pd.DataFrame, features: list[str], n_jobs: int = -1
+) -> list[dict]:
+    """
+    Tränar varje kodning i ENCODINGS på samma 75 % av datan och utvärderar på resten.
+    Mäter designmatrisens storlek, tid och högsta minnesanvändning för kodning och
+    träning (tracemalloc: Python- och NumPy-allokeringar, trädens egna C-strukturer syns
+    istället i modellens storlek) samt kvaliteten.
+    """
+    train, test = train_test_split(
+        train_df, test_size=0.25, stratify=train_df["is_shadow"], random_state=42
+    )
+    shadow_test = test["is_shadow"].to_numpy() == 1
+
+    report = []
+    for encoding in ENCODINGS:
+        params = {**default_params(encoding)}
+        if encoding != "native":
+            params["n_jobs"] = n_jobs
+        model = build_pipeline(train[features], params, encoding)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        X_train = model.named_steps["preprocessor"].fit_transform(train[features])
+        encoded = time.perf_counter()
+        model.named_steps["classifier"].fit(X_train, train["is_shadow"])
+        fitted = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start_predict = time.perf_counter()
+        probabilities = model.predict_proba(test[features])[:, 1]
+        predicted = time.perf_counter()
+
+        report.append(
+            {
+                "encoding": encoding,
+                "classifier": type(model.named_steps["classifier"]).__name__,
+                "matrix_columns": int(X_train.shape[1]),
+                "matrix_mb": round(matrix_bytes(X_train) / 1e6, 3),
+                "encode_seconds": round(encoded - start, 3),
+                "fit_seconds": round(fitted - encoded, 3),
+                "peak_alloc_mb": round(peak / 1e6, 1),
+                "model_mb": round(len(pickle.dumps(model)) / 1e6, 2),
+                "predict_seconds": round(predicted - start_predict, 3),
+                "average_precision": float(
+                    average_precision_score(test["is_shadow"], probabilities)
+                ),
+                "sensitivity": float((probabilities[shadow_test] >= 0.5).mean()),
+            }
+        )
+    return report
+
+
+def load_tuning(path: str = TUNED_PARAMS_FILE):
+    """Resultatet från senaste tune-körningen, eller None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def train_or_load_model(
+    train_df: pd.DataFrame,
+    features: list[str],
+    params: dict = RF_PARAMS,
+    force: bool = False,
+    encoding: str = ENCODING,
+) -> tuple[Pipeline, dict]:
+    """
+    Tränar om modellen bara om träningsdatan, kodningen eller hyperparametrarna ändrats
+    sedan senaste sparade modellen (eller om force=True). Returnerar (modell, metadata).
+    En one-hot-skog exporteras även till FOREST_FILE för snabb poängsättning
+    (forest_export.py).
+    """
+    model_params = {**params, "encoding": encoding}
+    train_hash = training_hash(train_df, features, model_params)
+    if not force:
+        model, meta = load_model()
+        if meta is not None and meta["training_hash"] == train_hash:
+            print(
+                "Träningsdata och hyperparametrar oförändrade, använder sparad modell."
+            )
+            # n_jobs hör inte till modellen: den sparade har kvar körningen den tränades med
+            if "n_jobs" in params:
+                set_n_jobs(model, params["n_jobs"])
+            if encoding == "onehot" and not os.path.exists(FOREST_FILE):
+                export_forest(model).save(FOREST_FILE)
+            return model, meta
+
+    model = model_building(train_df, features, params, encoding)
+    meta = save_model(model, train_df[features], model_params, train_hash)
+    if encoding == "onehot":
+        export_forest(model).save(FOREST_FILE)
+    return model, meta
+
+
+_worker_model = None
+
+
+def _init_scoring_worker(model) -> None:
+    # Modellen skickas en gång per process; trädens egna trådar stängs av i poolen
+    global _worker_model
+    _worker_model = model
+    set_n_jobs(_worker_model, 1)
+
+
+def _score_chunk(X_chunk) -> np.ndarray:
+    return _worker_model.predict_proba(X_chunk)[:, 1]
+
+
+def predict_in_chunks(
+    X,
+    model,
+    n_jobs: int = 1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    predict_proba chunkvis. X är antingen en DataFrame (model = pipelinen) eller en redan
+    kodad designmatris (model = bara skogen). Med n_jobs != 1 och mer än en chunk fördelas
+    chunkarna över en processpool (n_jobs=-1 -> alla kärnor). Ordningen behålls, så
+    resultatet är identiskt med ett enda predict_proba-anrop.
+    """
+    rows = X.iloc if isinstance(X, pd.DataFrame) else X
+    chunks = [rows[i : i + chunk_size] for i in range(0, X.shape[0], chunk_size)]
+    if not chunks:
+        return np.empty(0)
+    if n_jobs == 1 or len(chunks) == 1:
+        return np.concatenate([model.predict_proba(c)[:, 1] for c in chunks])
+
+    workers = os.cpu_count() if n_jobs < 0 else n_jobs
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        initializer=_init_scoring_worker,
+        initargs=(model,),
+    ) as pool:
+        return np.concatenate(list(pool.map(_score_chunk, chunks)))
+
+
 def model_prediction(
-    unknown_df: pd.DataFrame, features: list[str], model: Pipeline
+    unknown_df: pd.DataFrame,
+    features: list[str],
+    model: Pipeline,
+    n_jobs: int = 1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
 ) -> pd.DataFrame:
-    X_unknown = unknown_df[features]
-    unknown_df["Shadow_Probability"] = model.predict_proba(X_unknown)[:, 1]
+    # Ny indata kodas direkt (inte via featurecachen), skogen poängsätter designmatrisen
+    X_unknown = model.named_steps["preprocessor"].transform(unknown_df[features])
+    unknown_df["Shadow_Probability"] = predict_in_chunks(
+        X_unknown, model.named_steps["classifier"], n_jobs, chunk_size
+    )
 
     # Filtrera på tröskelvärde
     threshold = 0.0
@@ -158,47 +556,439 @@ def model_prediction(
     return suspect_df
 
 
+def iter_chunks(filepath: str, chunk_size: int, label: int = 0):
+    """
+    Läser CSV, Parquet eller kolumnfil (.arrow) i chunkar om högst chunk_size rader
+    och städar varje chunk, så att hela filen aldrig behöver ligga i minnet. Varje chunk
+    får samma historikfeatures som load_and_clean ger, så stream och batch poängsätter
+    med samma features.
+    """
+    history = history_features()  # läses en gång, joinas per chunk
+    for chunk in _read_chunks(filepath, chunk_size, label):
+        yield join_history_features(chunk, features=history)
+
+
+def _read_chunks(filepath: str, chunk_size: int, label: int):
+    if filepath.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_size):
+            yield clean_frame(batch.to_pandas(), label)
+    elif filepath.endswith(STORE_SUFFIX):
+        import pyarrow as pa
+
+        # Memory-mappad, så bara den aktuella chunken läses in
+        with pa.memory_map(filepath) as source:
+            table = pa.ipc.open_file(source).read_all()
+            for batch in table.to_batches(max_chunksize=chunk_size):
+                chunk = batch.to_pandas()
+                chunk["is_shadow"] = label
+                yield chunk
+    else:
+        for chunk in pd.read_csv(filepath, chunksize=chunk_size):
+            yield clean_frame(chunk, label)
+
+
+def stream_scores(
+    input_file: str,
+    features: list[str],
+    model: Pipeline,
+    output_file: str = STREAM_OUTPUT_FILE,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+    top_k: int = STREAM_TOP_K,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """
+    Poängsätter input_file chunk för chunk och skriver varje poängsatt chunk direkt till
+    output_file. Istället för en global sortering hålls en heap med de top_k högsta
+    sannolikheterna, så minnet är konstant oavsett filens storlek.
+    Returnerar de top_k mest riskfyllda fartygen sorterade (högst först).
+    """
+    heap = []  # min-heap av (sannolikhet, löpnummer, rad)
+    seq = 0
+    n_rows = 0
+    # output_file byts ut först när alla chunkar är skrivna
+    with atomic_write(output_file, newline="") as output:
+        for i, chunk in enumerate(iter_chunks(input_file, chunk_size)):
+            chunk["Shadow_Probability"] = predict_in_chunks(
+                chunk[features], model, n_jobs, chunk_size
+            )
+            chunk.to_csv(output, header=i == 0, index=False)
+            n_rows += len(chunk)
+
+            # Bara chunkens egna top_k kan ta sig in i heapen
+            candidates = chunk.nlargest(top_k, "Shadow_Probability")
+            for row in candidates.to_dict("records"):
+                item = (row["Shadow_Probability"], seq, row)
+                seq += 1
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+                else:
+                    break  # candidates är sorterade, resten är ännu lägre
+
+            print(f"Chunk {i + 1}: {n_rows} rader poängsatta")
+
+    top = sorted(heap, key=lambda item: (-item[0], item[1]))
+    return pd.DataFrame([row for _, _, row in top])
+
+
+def feature_fingerprint(
+    df: pd.DataFrame, features: list[str], model_hash: str
+) -> pd.Series:
+    """
+    Fingeravtryck per rad av features. Saltet gör att en ny modell ger nya
+    fingeravtryck, så att allt poängsätts om när modellen tränats om.
+    """
+    X = df[features].copy()
+    for col in features:
+        if pd.api.types.is_numeric_dtype(X[col]):
+            X[col] = X[col].astype("float64")
+        else:
+            X[col] = X[col].astype(object)
+    return pd.util.hash_pandas_object(X, index=False, hash_key=model_hash[:16])
+
+
+def incremental_prediction(
+    unknown_df: pd.DataFrame,
+    features: list[str],
+    model: Pipeline,
+    model_hash: str,
+    previous_file: str = OUTPUT_FILE,
+    n_jobs: int = 1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+) -> tuple[pd.DataFrame, int]:
+    """
+    Som model_prediction, men återanvänder poängen i previous_file för fartyg (IMO) vars
+    fingeravtryck inte ändrats. Bara nya och ändrade fartyg poängsätts.
+    Returnerar (poängsatta fartyg, antal som poängsattes om).
+    """
+    unknown_df = unknown_df.copy()
+    unknown_df[FINGERPRINT_COLUMN] = feature_fingerprint(
+        unknown_df, features, model_hash
+    )
+
+    try:
+        previous = load_fleet(previous_file)
+    except FileNotFoundError:
+        previous = None
+
+    if previous is not None and FINGERPRINT_COLUMN in previous.columns:
+        previous = previous[["IMO", FINGERPRINT_COLUMN, "Shadow_Probability"]]
+        previous[FINGERPRINT_COLUMN] = previous[FINGERPRINT_COLUMN].astype("uint64")
+        # Samma IMO kan förekomma flera gånger i skrapningen; samma features ger samma poäng
+        previous = previous.drop_duplicates(subset=["IMO", FINGERPRINT_COLUMN])
+        scored = unknown_df.merge(previous, on=["IMO", FINGERPRINT_COLUMN], how="left")
+    else:
+        scored = unknown_df.assign(Shadow_Probability=np.nan)
+
+    changed = scored["Shadow_Probability"].isna().to_numpy()
+    if changed.any():
+        scored.loc[changed, "Shadow_Probability"] = predict_in_chunks(
+            scored.loc[changed, features], model, n_jobs, chunk_size
+        )
+
+    scored = scored.sort_values(by="Shadow_Probability", ascending=False)
+    return scored, int(changed.sum())
+
+
+def save_scores(suspect_df: pd.DataFrame) -> None:
+    ### Sparar resultatet som CSV och som kolumnfil (läses av dashboarden)
+    # Atomärt, dashboarden kan ladda om filerna när som helst
+    with atomic_write(OUTPUT_FILE, newline="") as f:
+        suspect_df.to_csv(f, index=False)
+    if store_available():
+        write_store(prepare_frame(suspect_df), store_path(OUTPUT_FILE))
+
+
 def model_oob_evaluation(model: Pipeline) -> int:
     ### Beräknar OOB-score
     rf = model.named_steps["classifier"]
+    if not hasattr(rf, "oob_score_"):
+        # HistGradientBoosting: accuracy på den utelämnade valideringsdelen istället
+        return float(rf.validation_score_[-1])
     oob_score = rf.oob_score_
     return oob_score
 
 
-def model_sensitivity_evaluation(shadow_df: pd.DataFrame, model: Pipeline) -> int:
+def model_sensitivity_evaluation(
+    shadow_df: pd.DataFrame, model: Pipeline, features: list[str] = FEATURES
+) -> int:
 
     ### Beräknar sensitivity för modellen
-    X_shadow = model.named_steps["preprocessor"].transform(shadow_df[features])
+    X_shadow = feature_cache.transform(
+        model.named_steps["preprocessor"], shadow_df[features]
+    )
     y_pred = model.named_steps["classifier"].predict(X_shadow)
     sensitivity = y_pred.mean()  # andelen korrekt klassade shadow-fartyg
     return sensitivity
 
 
-if __name__ == "__main__":
+def run_training(
+    force: bool = False,
+    n_jobs: int = -1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+    encoding: str = ENCODING,
+    headless: bool = False,
+) -> None:
+    ### Tränar (eller återanvänder) modellen, poängsätter de okända fartygen och sparar nyckeltal
+    ### headless=True: ingen interaktiv plot, så att batchkörningar aldrig blockerar
+    timer = StageTimer()
+
+    # CSV:erna parsas och städas bara när de ändrats, annars läses kolumnfilerna direkt
+    with timer.stage("load") as stage:
+        shadow_df = load_and_clean(ensure_store(SHADOW_FILE), 1)
+        unknown_df = load_and_clean(ensure_store(UNKNOWN_FILE), 0)
+        full_df = pd.concat([shadow_df, unknown_df])
+        stage["rows"] = len(full_df)
+
+    with timer.stage("eda", rows=len(full_df)):
+        exploratory_data_analysis(full_df)
+        feature_selection(full_df, headless)
+
+    features = FEATURES
+    # Parametrarna från senaste tune-körningen ersätter skogens standardvärden
+    tuning = load_tuning() if encoding != "native" else None
+    tuned_params = tuning["best_params"] if tuning else {}
+    params = {**default_params(encoding), **tuned_params}
+    if encoding != "native":
+        params["n_jobs"] = n_jobs
+    with timer.stage("fit", rows=len(full_df)):
+        model, model_meta = train_or_load_model(
+            full_df, features, params, force=force, encoding=encoding
+        )
+
+    with timer.stage("predict", rows=len(unknown_df)):
+        suspect_df = model_prediction(unknown_df, features, model, n_jobs, chunk_size)
+        suspect_df[FINGERPRINT_COLUMN] = feature_fingerprint(
+            suspect_df, features, model_meta["training_hash"]
+        )
+        save_scores(suspect_df)
+
+    with timer.stage("evaluation", rows=len(full_df)):
+        feature_importance = feature_evaluation(full_df, model)
+        oob_score = model_oob_evaluation(model)
+        sensitivity = model_sensitivity_evaluation(shadow_df, model, features)
+
+    metrics = {
+        "sensitivity": sensitivity,
+        "oob_score": oob_score,
+        "feature_importance": feature_importance.to_dict(orient="list"),
+        "model_hash": model_meta["training_hash"],
+        "encoding": encoding,
+    }
+    if tuning:
+        metrics["tuning"] = tuning
+    metrics["timings"] = timer.summary()
+    with atomic_write(METRICS_FILE) as f:
+        json.dump(metrics, f)
+
+    print("\n" + timer.report())
 
-    shadow_df = load_and_clean(SHADOW_FILE, 1)
-    unknown_df = load_and_clean(UNKNOWN_FILE, 0)
 
+def run_tuning(
+    n_jobs: int = -1,
+    n_candidates: int = TUNING_CANDIDATES,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+    headless: bool = False,
+) -> None:
+    ### Söker bästa hyperparametrarna, sparar dem och tränar om modellen med dem
+    shadow_df = load_and_clean(ensure_store(SHADOW_FILE), 1)
+    unknown_df = load_and_clean(ensure_store(UNKNOWN_FILE), 0)
     full_df = pd.concat([shadow_df, unknown_df])
 
-    exploratory_data_analysis(full_df)
+    tuning = hyperparameter_search(full_df, FEATURES, n_jobs, n_candidates)
+    print(
+        f"Bästa {tuning['scoring']}: {tuning['best_score']:.4f} med "
+        f"{tuning['best_params']} ({tuning['elapsed_seconds']} s)"
+    )
 
-    feature_selection(full_df)
+    with atomic_write(TUNED_PARAMS_FILE) as f:
+        json.dump(tuning, f, indent=2)
 
-    features = ["Type", "Flag", "Built", "DWT", "Length"]
-    model = model_building(full_df, features)
+    run_training(n_jobs=n_jobs, chunk_size=chunk_size, headless=headless)
 
-    suspect_df = model_prediction(unknown_df, features, model)
 
-    feature_importance = feature_evaluation(full_df, model)
+def run_encoding_report(n_jobs: int = -1) -> None:
+    ### Jämför kodningarna (tid, minne, kvalitet) och sparar till ENCODING_REPORT_FILE
+    shadow_df = load_and_clean(ensure_store(SHADOW_FILE), 1)
+    unknown_df = load_and_clean(ensure_store(UNKNOWN_FILE), 0)
+    full_df = pd.concat([shadow_df, unknown_df])
 
-    oob_score = model_oob_evaluation(model)
-    sensitivity = model_sensitivity_evaluation(shadow_df, model)
+    report = encoding_report(full_df, FEATURES, n_jobs)
+    print(pd.DataFrame(report).set_index("encoding").T.to_string())
 
-    metrics = {
-        "sensitivity": sensitivity,
-        "oob_score": oob_score,
-        "feature_importance": feature_importance.to_dict(orient="list"),
-    }
-    with open("model_metrics.json", "w") as f:
-        json.dump(metrics, f)
+    with atomic_write(ENCODING_REPORT_FILE) as f:
+        json.dump(report, f, indent=2)
+
+
+def scoring_input(input_file: str) -> str:
+    """
+    Filen som ska läsas för input_file. Kolumnfilen byggs bara för filer i projektets
+    datakatalog; en fil någon annanstans (--input) läses som den är, utan att en .arrow
+    skrivs bredvid den.
+    """
+    data_dir = os.path.abspath(os.path.dirname(UNKNOWN_FILE))
+    if os.path.dirname(os.path.abspath(input_file)) == data_dir:
+        return ensure_store(input_file)
+    return input_file
+
+
+def run_scoring(
+    input_file: str = UNKNOWN_FILE,
+    n_jobs: int = -1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+    incremental: bool = False,
+) -> None:
+    ### Poängsätter nya fartyg med den sparade modellen, utan att träna om
+    ### incremental=True: bara nya/ändrade fartyg jämfört med förra OUTPUT_FILE
+    model, model_meta = load_model()
+    if model is None:
+        raise SystemExit(
+            "Ingen sparad modell hittades, kör först: python model/first_sort.py train"
+        )
+
+    unknown_df = load_and_clean(scoring_input(input_file), 0)
+    check_schema(unknown_df, model_meta)
+
+    features = model_meta["features"]
+    model_hash = model_meta["training_hash"]
+    set_n_jobs(model, n_jobs)
+
+    if incremental:
+        suspect_df, n_scored = incremental_prediction(
+            unknown_df, features, model, model_hash, OUTPUT_FILE, n_jobs, chunk_size
+        )
+    else:
+        suspect_df = model_prediction(unknown_df, features, model, n_jobs, chunk_size)
+        suspect_df[FINGERPRINT_COLUMN] = feature_fingerprint(
+            suspect_df, features, model_hash
+        )
+        n_scored = len(suspect_df)
+
+    save_scores(suspect_df)
+    print(f"Poängsatte {n_scored} av {len(suspect_df)} fartyg -> {OUTPUT_FILE}")
+
+
+def run_streaming(
+    input_file: str = UNKNOWN_FILE,
+    output_file: str = STREAM_OUTPUT_FILE,
+    top_k: int = STREAM_TOP_K,
+    n_jobs: int = -1,
+    chunk_size: int = SCORING_CHUNK_SIZE,
+) -> None:
+    ### Poängsätter filer som är större än minnet med den sparade modellen
+    model, model_meta = load_model()
+    if model is None:
+        raise SystemExit(
+            "Ingen sparad modell hittades, kör först: python model/first_sort.py train"
+        )
+
+    set_n_jobs(model, n_jobs)
+    top_df = stream_scores(
+        input_file,
+        model_meta["features"],
+        model,
+        output_file,
+        chunk_size,
+        top_k,
+        n_jobs,
+    )
+    save_scores(top_df)
+    print(
+        f"Alla poäng -> {output_file}, de {len(top_df)} mest riskfyllda -> {OUTPUT_FILE}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shadow fleet-modellen")
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        default="train",
+        choices=["train", "score", "incremental", "stream", "tune", "encodings"],
+        help=(
+            "train: träna (om något ändrats) och poängsätt, score: bara poängsätt, "
+            "incremental: poängsätt bara nya/ändrade fartyg, "
+            "stream: poängsätt chunkvis (CSV/Parquet/.arrow större än minnet), "
+            "tune: sök hyperparametrar och träna om med de bästa, "
+            "encodings: jämför kodningarna av Type/Flag"
+        ),
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="träna om även om inget ändrats"
+    )
+    parser.add_argument(
+        "--input",
+        default=UNKNOWN_FILE,
+        help="fartyg att poängsätta (score/incremental/stream)",
+    )
+    parser.add_argument(
+        "--output",
+        default=STREAM_OUTPUT_FILE,
+        help="fil för alla poängsatta rader (stream)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=STREAM_TOP_K,
+        help="antal mest riskfyllda fartyg som sparas till dashboarden (stream)",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=-1,
+        help="kärnor för träning och poängsättning (-1 = alla, 1 = ingen parallellism)",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default=ENCODING,
+        help="kodning av kategoriska features och klassificerare (train)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=TUNING_CANDIDATES,
+        help="antal slumpade parameterkombinationer i första varvet (tune)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=SCORING_CHUNK_SIZE,
+        help="rader per chunk vid poängsättning",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="inga interaktiva plottar, för batchkörningar (train/tune)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILERS,
+        help="profilera hela körningen med cProfile eller pyinstrument",
+    )
+    parser.add_argument(
+        "--profile-output",
+        help="fil för profilen (standard model/profile.prof eller .html)",
+    )
+    args = parser.parse_args()
+
+    with profiled(args.profile, args.profile_output):
+        if args.mode == "train":
+            run_training(
+                args.force, args.n_jobs, args.chunk_size, args.encoding, args.headless
+            )
+        elif args.mode == "encodings":
+            run_encoding_report(args.n_jobs)
+        elif args.mode == "tune":
+            run_tuning(args.n_jobs, args.candidates, args.chunk_size, args.headless)
+        elif args.mode in ("score", "incremental"):
+            run_scoring(
+                args.input, args.n_jobs, args.chunk_size, args.mode == "incremental"
+            )
+        else:
+            run_streaming(
+                args.input, args.output, args.top_k, args.n_jobs, args.chunk_size
+            )
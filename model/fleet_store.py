@@ -0,0 +1,132 @@
+"""
+Kolumnbaserad lagring av fartygsdata (Arrow IPC / Feather v2).
+
+CSV-filerna parsas EN gång av pipelinen och skrivs som okomprimerade .arrow-filer med
+färdiga typer: kategoriska Flag/Type, Length/Width uppdelade från Size och förberäknad Age.
+Både dashboarden och modellen läser sedan filen med memory-mapping istället för att
+parsa CSV:n på nytt.
+
+Kräver pyarrow. Saknas det faller allt tillbaka på CSV-filerna som tidigare.
+"""
+
+import os
+
+import pandas as pd
+
+from process_utils import atomic_write
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow saknas -> CSV används
+    feather = None
+
+STORE_SUFFIX = ".arrow"
+REFERENCE_YEAR = 2025  # Samma år som dashboarden räknar ålder från
+NUMERIC_COLUMNS = ["Built", "GT", "DWT", "Length", "Width"]
+CATEGORY_COLUMNS = ["Type", "Flag"]
+
+
+def store_available() -> bool:
+    return feather is not None
+
+
+def store_path(filepath: str) -> str:
+    """vessel_data/unknown_vessels.csv -> vessel_data/unknown_vessels.arrow"""
+    return os.path.splitext(filepath)[0] + STORE_SUFFIX
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Typar och städar en rå fartygstabell så som den ska ligga i kolumnfilen."""
+    df = df.copy()
+
+    # Dela upp size ("250 / 46") i Length och Width
+    if "Size" in df.columns:
+        size = df["Size"].astype("string").str.split("/", n=1, expand=True)
+        size = size.reindex(columns=[0, 1])
+        df["Length"] = pd.to_numeric(size[0], errors="coerce").astype("float64")
+        df["Width"] = pd.to_numeric(size[1], errors="coerce").astype("float64")
+        df = df.drop("Size", axis=1)
+
+    df["IMO"] = pd.to_numeric(df["IMO"], errors="coerce").fillna(0).astype("int64")
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    if "Built" in df.columns:
+        df["Age"] = REFERENCE_YEAR - df["Built"].fillna(REFERENCE_YEAR)
+
+    # Slår ihop "-" och "Unknown" innan kolumnerna görs kategoriska
+    if "Flag" in df.columns:
+        df["Flag"] = df["Flag"].replace("-", "Unknown")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].fillna("Unknown").astype("category")
+
+    return df.reset_index(drop=True)
+
+
+# Kompakta typer för dashboarden (heltal utan saknade värden blir int32, annars Int32)
+COMPACT_INT_COLUMNS = ["IMO", "Built"]
+COMPACT_FLOAT_COLUMNS = ["Shadow_Probability", "Age", "GT", "DWT", "Length", "Width"]
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Minimerar minnet för en inläst fartygstabell: kategoriska Type/Flag,
+    int32 för IMO/Built och float32 för sannolikheter och storlekar.
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in COMPACT_INT_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors="coerce")
+            df[col] = values.astype("int32" if values.notna().all() else "Int32")
+    for col in COMPACT_FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    if "is_shadow" in df.columns:
+        df["is_shadow"] = df["is_shadow"].astype("int8")
+    return df
+
+
+def write_store(df: pd.DataFrame, path: str) -> None:
+    """Skriver df okomprimerat (krävs för memory-mapping), atomärt (atomic_write)."""
+    with atomic_write(path, "wb") as f:
+        feather.write_feather(df, f, compression="uncompressed")
+
+
+def read_store(path: str) -> pd.DataFrame:
+    """Läser en kolumnfil med memory-mapping."""
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def ensure_store(csv_path: str) -> str:
+    """
+    Bygger kolumnfilen från CSV:n om den saknas eller är äldre än CSV:n.
+    Returnerar sökvägen som ska läsas (CSV:n om pyarrow saknas).
+    """
+    if not store_available():
+        return csv_path
+
+    path = store_path(csv_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        write_store(prepare_frame(pd.read_csv(csv_path)), path)
+    return path
+
+
+def load_fleet(csv_path: str) -> pd.DataFrame:
+    """Läser kolumnfilen om den finns och är aktuell, annars CSV:n."""
+    path = store_path(csv_path)
+    if (
+        store_available()
+        and os.path.exists(path)
+        and (
+            not os.path.exists(csv_path)
+            or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+        )
+    ):
+        return read_store(path)
+    return pd.read_csv(csv_path)
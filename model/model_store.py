@@ -0,0 +1,86 @@
+"""
+Sparar och laddar den tränade modellen så att den inte behöver tränas om vid varje körning.
+
+- shadow_model.joblib: hela sklearn-pipelinen (preprocessor + classifier)
+- shadow_model.json: features och deras typer, hyperparametrar och en hash av träningsdatan
+
+Hashen räknas på träningsdatan, features, hyperparametrarna och sklearn-versionen.
+Så länge den är oförändrad kan den sparade pipelinen återanvändas.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.pipeline import Pipeline
+
+from process_utils import atomic_write
+
+MODEL_FILE = "model/shadow_model.joblib"
+MODEL_META_FILE = "model/shadow_model.json"
+
+# Parametrar som bara styr hur modellen körs, inte vad den blir
+EXECUTION_PARAMS = ("n_jobs", "verbose")
+
+
+def training_hash(train_df: pd.DataFrame, features: list[str], params: dict) -> str:
+    """Hash av allt som påverkar den tränade modellen."""
+    params = {k: v for k, v in params.items() if k not in EXECUTION_PARAMS}
+    h = hashlib.sha256()
+    rows = pd.util.hash_pandas_object(train_df[features + ["is_shadow"]], index=False)
+    h.update(rows.to_numpy().tobytes())
+    h.update(
+        json.dumps(
+            {"features": features, "params": params, "sklearn": sklearn.__version__},
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+    return h.hexdigest()
+
+
+def save_model(
+    model: Pipeline,
+    X_train: pd.DataFrame,
+    params: dict,
+    train_hash: str,
+    model_file: str = MODEL_FILE,
+    meta_file: str = MODEL_META_FILE,
+) -> dict:
+    """Sparar pipelinen och dess metadata. Returnerar metadatan."""
+    meta = {
+        "training_hash": train_hash,
+        "features": X_train.columns.tolist(),
+        "dtypes": {col: str(dtype) for col, dtype in X_train.dtypes.items()},
+        "params": params,
+        "sklearn": sklearn.__version__,
+        "n_train": len(X_train),
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    with atomic_write(model_file, "wb") as f:
+        joblib.dump(model, f)
+    with atomic_write(meta_file) as f:
+        json.dump(meta, f, indent=2, default=str)
+
+    return meta
+
+
+def load_model(model_file: str = MODEL_FILE, meta_file: str = MODEL_META_FILE):
+    """Returnerar (pipeline, metadata), eller (None, None) om ingen modell sparats."""
+    if not (os.path.exists(model_file) and os.path.exists(meta_file)):
+        return None, None
+    with open(meta_file, "r") as f:
+        meta = json.load(f)
+    return joblib.load(model_file), meta
+
+
+def check_schema(df: pd.DataFrame, meta: dict) -> None:
+    """Säkerställer att indatan har de features modellen tränades på."""
+    missing = [col for col in meta["features"] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Indatan saknar features som modellen kräver: {missing}")
@@ -0,0 +1,69 @@
+"""
+Hjälpmedel för kod som körs i flera processer samtidigt (gunicorn-workers, pipelinen och
+dashboarden mot samma filer):
+
+- atomic_write(): skriver en fil så att läsare aldrig ser den halvskriven
+- PerProcessThread: en bakgrundstråd som finns i varje process, även efter fork
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# mkstemp skapar filer med 0600; de färdiga filerna ska få de vanliga rättigheterna
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", **kwargs):
+    """
+    Öppnar en unik temporär fil i samma katalog som path och byter in den som path med
+    os.replace när blocket är klart. Läsare ser alltid antingen den gamla eller den nya
+    filen, och samtidiga skrivare krockar inte på ett gemensamt .tmp-namn. Går blocket
+    fel tas den temporära filen bort och path lämnas orörd. kwargs går till open().
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PerProcessThread:
+    """
+    En daemon-tråd som startas en gång per process.
+
+    Trådar följer inte med vid fork: gunicorn läser in appen i master-processen
+    (preload_app) och forkar sedan sina workers, som då saknar masterns trådar. start()
+    anropas därför där tråden behövs och startar den första gången i varje process.
+    setup() körs före tråden startas, t.ex. för att skapa en ny kö i den nya processen.
+    """
+
+    def __init__(self, target, name: str, setup=None):
+        self.target = target
+        self.name = name
+        self.setup = setup
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                if self.setup is not None:
+                    self.setup()
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self.target, name=self.name, daemon=True
+                ).start()
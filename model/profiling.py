@@ -0,0 +1,120 @@
+"""
+Tidtagning och profilering av pipelinens steg.
+
+- StageTimer: väggtid, processens högsta RSS och antal rader per steg (load, EDA, fit,
+  predict, evaluation). run_training sparar mätningarna i model_metrics.json under "timings".
+- profiled(): kör ett block under cProfile eller pyinstrument (om det är installerat)
+  och sparar profilen till fil.
+"""
+
+import cProfile
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+from process_utils import atomic_write
+
+try:
+    import resource
+except ImportError:  # finns inte på Windows
+    resource = None
+
+PROFILERS = ["cprofile", "pyinstrument"]
+PROFILE_FILES = {
+    "cprofile": "model/profile.prof",  # python -m pstats / snakeviz
+    "pyinstrument": "model/profile.html",
+}
+PROFILE_TOP = 25  # funktioner som skrivs ut från cProfile-profilen
+
+
+def peak_rss_mb():
+    """Processens högsta RSS hittills i MB, eller None om den inte går att läsa."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss är i kB på Linux men i bytes på macOS
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+class StageTimer:
+    """
+    Samlar mätningar per steg:
+
+        timer = StageTimer()
+        with timer.stage("load") as stage:
+            df = ...
+            stage["rows"] = len(df)
+
+    peak_rss_mb är processens högsta RSS när steget är klart. Den kan bara växa, så steget
+    där den hoppar är det som drev upp minnet.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        record = {"stage": name, "rows": rows}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            record["peak_rss_mb"] = peak_rss_mb()
+            self.stages.append(record)
+
+    def summary(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def report(self) -> str:
+        lines = [f"{'Steg':<12}{'Rader':>10}{'Sekunder':>11}{'Peak RSS (MB)':>15}"]
+        for s in self.stages:
+            rows = "" if s["rows"] is None else s["rows"]
+            rss = "" if s["peak_rss_mb"] is None else s["peak_rss_mb"]
+            lines.append(f"{s['stage']:<12}{rows:>10}{s['seconds']:>11.2f}{rss:>15}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profiled(profiler: str = None, output: str = None):
+    """Kör blocket under profiler ("cprofile"/"pyinstrument", None = ingen profilering)."""
+    if profiler is None:
+        yield
+        return
+    output = output or PROFILE_FILES[profiler]
+
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise SystemExit(
+                "pyinstrument är inte installerat (pip install pyinstrument), "
+                "använd --profile cprofile"
+            )
+        session = Profiler()
+        session.start()
+        try:
+            yield
+        finally:
+            session.stop()
+            with atomic_write(output, encoding="utf-8") as f:
+                f.write(session.output_html())
+    else:
+        session = cProfile.Profile()
+        session.enable()
+        try:
+            yield
+        finally:
+            session.disable()
+            session.dump_stats(output)
+            pstats.Stats(session).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+    print(f"Profil sparad till {output}")
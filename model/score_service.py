@@ -0,0 +1,219 @@
+"""
+Poängsättning av enskilda fartyg på begäran, med den sparade modellen.
+
+ScoringService.score() tar ett fartygs uppgifter (Type, Flag, Built, DWT och Size eller
+Length) och returnerar Shadow_Probability. Samtidiga anrop samlas av en bakgrundstråd
+till en batch och ett enda predict_proba-anrop. Resultaten cachas (LRU) på de
+normaliserade uppgifterna, så upprepade uppslag inte behöver modellen alls.
+
+Modellen är FastForest-exporten (forest_export.py) om den är aktuell, annars den sparade
+sklearn-pipelinen. Båda laddas om automatiskt när first_sort.py sparat en ny modell.
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from forest_export import FOREST_FILE, FastForest
+from model_store import MODEL_FILE, check_schema, load_model
+from process_utils import PerProcessThread
+
+# Uppgifterna som tjänsten tar emot, i den ordning de ligger i cache-nyckeln
+PARTICULARS = ["Type", "Flag", "Built", "DWT", "Length"]
+
+MAX_BATCH = 256  # fartyg per predict_proba-anrop
+BATCH_WAIT = 0.002  # sekunder som en batch väntar på fler anrop
+CACHE_SIZE = 100_000
+RESULT_TIMEOUT = 5.0
+MODEL_CHECK_INTERVAL = 1.0  # sekunder mellan kontrollerna om modellen bytts ut
+
+
+def _text(value) -> str:
+    if not isinstance(value, str) and pd.isna(value):
+        return "Unknown"
+    value = str(value).strip()
+    return value if value and value != "-" else "Unknown"
+
+
+def _number(value):
+    """Som pd.to_numeric(errors="coerce"), men None istället för NaN (NaN != NaN i nycklar)."""
+    if not isinstance(value, str) and pd.isna(value):
+        return None
+    try:
+        value = float(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+
+def normalize_particulars(particulars: dict) -> tuple:
+    """
+    Normaliserar ett fartygs uppgifter på samma sätt som pipelinen städar datan
+    ("-" och saknad Flag/Type blir "Unknown", Length tas från Size "250 / 46").
+    Returnerar en tuple i PARTICULARS-ordning, som också är cache-nyckeln.
+    """
+    length = particulars.get("Length")
+    if length is None and particulars.get("Size") is not None:
+        length = str(particulars["Size"]).split("/", 1)[0]
+
+    return (
+        _text(particulars.get("Type")),
+        _text(particulars.get("Flag")),
+        _number(particulars.get("Built")),
+        _number(particulars.get("DWT")),
+        _number(length),
+    )
+
+
+def load_predictor():
+    """
+    Returnerar (predict, version) där predict tar en dict kolumn -> värden och ger
+    sannolikheten för klass 1 per rad. Returnerar (None, None) om ingen modell sparats.
+    """
+    if not os.path.exists(MODEL_FILE):
+        return None, None
+    model_mtime = os.path.getmtime(MODEL_FILE)
+
+    # Exporten skrivs direkt efter pipelinen; är den äldre hör den till en tidigare modell
+    if os.path.exists(FOREST_FILE) and os.path.getmtime(FOREST_FILE) >= model_mtime:
+        forest = FastForest.load(FOREST_FILE)
+        check_schema(pd.DataFrame(columns=PARTICULARS), {"features": forest.features})
+        return forest.predict_proba, f"forest:{os.path.getmtime(FOREST_FILE)}"
+
+    model, meta = load_model()
+    check_schema(pd.DataFrame(columns=PARTICULARS), meta)
+    # Små batchar: trådpoolen kostar mer än den ger (bara skogen har n_jobs)
+    if "n_jobs" in model.named_steps["classifier"].get_params():
+        model.set_params(classifier__n_jobs=1)
+
+    def predict(columns):
+        return model.predict_proba(pd.DataFrame(columns)[meta["features"]])[:, 1]
+
+    return predict, f"pipeline:{model_mtime}"
+
+
+class ScoringService:
+    """Micro-batchande poängsättning med LRU-cache. Trådsäker."""
+
+    def __init__(
+        self,
+        max_batch: int = MAX_BATCH,
+        batch_wait: float = BATCH_WAIT,
+        cache_size: int = CACHE_SIZE,
+    ):
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._predict = None
+        self._version = None
+        self._model_mtime = None
+        self._checked_at = 0.0
+        self._queue = None
+        self._worker = PerProcessThread(self._run, "scoring-batcher", self._new_queue)
+
+    @property
+    def version(self):
+        return self._version
+
+    def _refresh(self) -> None:
+        """Laddar (om) modellen om den saknas eller har sparats om sedan sist."""
+        now = time.monotonic()
+        if self._predict is not None and now - self._checked_at < MODEL_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if (
+                self._predict is not None
+                and now - self._checked_at < MODEL_CHECK_INTERVAL
+            ):
+                return
+            self._checked_at = now
+            model_mtime = (
+                os.path.getmtime(MODEL_FILE) if os.path.exists(MODEL_FILE) else None
+            )
+            if self._predict is not None and self._model_mtime == model_mtime:
+                return
+            predict, version = load_predictor()
+            if predict is None:
+                raise FileNotFoundError(
+                    f"No saved model ({MODEL_FILE}), run model/first_sort.py first."
+                )
+            self._predict, self._version = predict, version
+            self._model_mtime = model_mtime
+            self._cache.clear()
+
+    def _new_queue(self) -> None:
+        # Varje process har sin egen batch-tråd och därmed sin egen kö
+        self._queue = queue.Queue()
+
+    def _run(self) -> None:
+        requests = self._queue
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._score_batch(batch)
+
+    def _score_batch(self, batch: list) -> None:
+        predict, version = self._predict, self._version
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        columns = {
+            col: [math.nan if key[i] is None else key[i] for key in keys]
+            for i, col in enumerate(PARTICULARS)
+        }
+        try:
+            probabilities = dict(zip(keys, predict(columns).tolist()))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            # En modell som bytts ut under tiden ska inte fylla den nya cachen
+            if version == self._version:
+                for key, probability in probabilities.items():
+                    self._cache[key] = probability
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        for key, future in batch:
+            future.set_result(probabilities[key])
+
+    def score_many(self, vessels: list[dict]) -> list[tuple[float, bool]]:
+        """(Shadow_Probability, från cachen) per fartyg, i samma ordning."""
+        self._refresh()
+        keys = [normalize_particulars(vessel) for vessel in vessels]
+
+        results = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = (self._cache[key], True)
+
+        pending = [(i, Future()) for i, result in enumerate(results) if result is None]
+        if pending:
+            self._worker.start()
+            for i, future in pending:
+                self._queue.put((keys[i], future))
+            for i, future in pending:
+                results[i] = (future.result(timeout=RESULT_TIMEOUT), False)
+        return results
+
+    def score(self, particulars: dict) -> tuple[float, bool]:
+        return self.score_many([particulars])[0]
@@ -0,0 +1,311 @@
+"""
+Historik över skrapningarna: en ögonblicksbild per skrapdatum, nyckel (IMO, scrape_date).
+
+Varje skrapning sparas som en egen Parquet-partition, SNAPSHOT_DIR/scrape_date=ÅÅÅÅ-MM-DD/,
+så inget skrivs över och frågor bara läser de datum och kolumner de behöver. Bredvid
+partitionerna hålls tre små tabeller. När en nyare bild läggs till jämförs bara den mot
+den senaste kända:
+- _latest.parquet: senaste kända Name/Flag/Type per IMO och datumet de sågs
+- _changes.parquet: en rad per ändring (IMO, scrape_date, column, old, new)
+- _features.parquet: antal flagg- och namnbyten de senaste 6/12/24 månaderna per IMO
+
+Frågor:
+- as_of(datum): varje fartygs senaste bild till och med datumet
+- changes_since(datum): ändringar av Name/Flag/Type efter datumet
+- join_history_features(df): lägger till bytena som kolumner, joinat på IMO (används av
+  load_and_clean i first_sort.py; läser bara _features.parquet)
+
+    python model/snapshot_store.py add scrapers/vessels.csv --date 2025-12-26
+    python model/snapshot_store.py changes --since 2025-06-01
+
+Kräver pyarrow.
+"""
+
+import argparse
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow saknas -> ingen historik
+    pa = ds = None
+
+from process_utils import atomic_write
+
+SNAPSHOT_DIR = "vessel_data/snapshots"
+PARTITION_KEY = "scrape_date"
+SNAPSHOT_COLUMNS = ["IMO", "Name", "Type", "Flag", "Built", "GT", "DWT", "Size"]
+NUMERIC_COLUMNS = ["Built", "GT", "DWT"]
+TRACKED_COLUMNS = ["Name", "Flag", "Type"]  # ändringar av dessa loggas i _changes
+
+FEATURE_WINDOWS = [6, 12, 24]  # månader bakåt från senaste skrapningen
+HISTORY_FEATURES = [
+    f"{col}_changes_{months}m" for col in ["Flag", "Name"] for months in FEATURE_WINDOWS
+]
+
+LATEST_FILE = "_latest.parquet"
+CHANGES_FILE = "_changes.parquet"
+FEATURES_FILE = "_features.parquet"
+
+
+def _path(root: str, name: str) -> str:
+    return os.path.join(root, name)
+
+
+def _write_parquet(df: pd.DataFrame, path: str) -> None:
+    with atomic_write(path, "wb") as f:
+        df.to_parquet(f, index=False)
+
+
+def _read_parquet(path: str):
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def _known(values: pd.Series) -> pd.Series:
+    return values.notna() & ~values.isin(["Unknown", "-", ""])
+
+
+def normalize_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """En rå skrapning (samma kolumner som vessels.csv) med typer, en rad per IMO."""
+    snap = df.reindex(columns=SNAPSHOT_COLUMNS).copy()
+    snap["IMO"] = pd.to_numeric(snap["IMO"], errors="coerce")
+    snap = snap[snap["IMO"] > 0].astype({"IMO": "int64"})
+    for col in NUMERIC_COLUMNS:
+        snap[col] = pd.to_numeric(snap[col], errors="coerce").astype("float64")
+    for col in ["Name", "Type", "Flag", "Size"]:
+        snap[col] = snap[col].astype("string").str.strip()
+    # Samma städning som load_and_clean: "-" och saknad flagga är "Unknown"
+    snap["Flag"] = snap["Flag"].replace("-", "Unknown").fillna("Unknown")
+    return snap.drop_duplicates(subset="IMO", keep="last").reset_index(drop=True)
+
+
+def snapshot_dates(root: str = SNAPSHOT_DIR) -> list:
+    """Skrapdatumen som har en partition, äldst först."""
+    if not os.path.isdir(root):
+        return []
+    prefix = PARTITION_KEY + "="
+    return sorted(
+        pd.Timestamp(name[len(prefix) :])
+        for name in os.listdir(root)
+        if name.startswith(prefix)
+    )
+
+
+def _apply_snapshot(latest, changes, snap: pd.DataFrame, date: pd.Timestamp):
+    """Jämför en bild med senaste kända läget. Returnerar (nytt läge, nya ändringar)."""
+    current = snap[["IMO"] + TRACKED_COLUMNS].assign(seen=date)
+    if latest is None:
+        return current, changes
+
+    merged = current.merge(latest, on="IMO", suffixes=("", "_old"))
+    events = []
+    for col in TRACKED_COLUMNS:
+        old, new = merged[col + "_old"], merged[col]
+        # Byten till eller från en okänd flagga/ett okänt namn är brus, inte ett byte
+        changed = (_known(old) & _known(new) & (old != new)).to_numpy(dtype=bool)
+        events.append(
+            pd.DataFrame(
+                {
+                    "IMO": merged["IMO"][changed].to_numpy(),
+                    PARTITION_KEY: date,
+                    "column": col,
+                    "old": old[changed].to_numpy(),
+                    "new": new[changed].to_numpy(),
+                }
+            )
+        )
+
+    # Fartyg som inte finns i den nya bilden behåller sitt senast kända läge
+    kept = latest[~latest["IMO"].isin(current["IMO"])]
+    latest = pd.concat([kept, current], ignore_index=True)
+    parts = [c for c in [changes, *events] if c is not None and len(c)]
+    if parts:
+        changes = pd.concat(parts, ignore_index=True)
+    return latest, changes
+
+
+def _features(changes, reference_date: pd.Timestamp) -> pd.DataFrame:
+    """Antal byten per IMO och fönster (bara fartyg med minst ett byte)."""
+    if changes is None or changes.empty:
+        return pd.DataFrame(columns=["IMO"] + HISTORY_FEATURES)
+    per_imo = []
+    for col in ["Flag", "Name"]:
+        col_changes = changes[changes["column"] == col]
+        for months in FEATURE_WINDOWS:
+            since = reference_date - pd.DateOffset(months=months)
+            recent = col_changes[col_changes[PARTITION_KEY] > since]
+            per_imo.append(
+                recent.groupby("IMO").size().rename(f"{col}_changes_{months}m")
+            )
+    features = pd.concat(per_imo, axis=1).fillna(0).astype("int32")
+    return features.reindex(columns=HISTORY_FEATURES).reset_index()
+
+
+def _save_index(root: str, latest, changes, reference_date) -> None:
+    _write_parquet(latest, _path(root, LATEST_FILE))
+    if changes is None:
+        changes = pd.DataFrame(
+            {
+                "IMO": pd.Series(dtype="int64"),
+                PARTITION_KEY: pd.Series(dtype="datetime64[ns]"),
+                "column": pd.Series(dtype="string"),
+                "old": pd.Series(dtype="string"),
+                "new": pd.Series(dtype="string"),
+            }
+        )
+    _write_parquet(changes, _path(root, CHANGES_FILE))
+    _write_parquet(_features(changes, reference_date), _path(root, FEATURES_FILE))
+
+
+def rebuild_index(root: str = SNAPSHOT_DIR) -> None:
+    """Bygger om _latest/_changes/_features från alla partitioner (efter en bakåtfyllning)."""
+    latest = changes = None
+    dates = snapshot_dates(root)
+    for date in dates:
+        snap = _read_partition(root, date, ["IMO"] + TRACKED_COLUMNS)
+        latest, changes = _apply_snapshot(latest, changes, snap, date)
+    if dates:
+        _save_index(root, latest, changes, dates[-1])
+
+
+def _partition_dir(root: str, date: pd.Timestamp) -> str:
+    return _path(root, f"{PARTITION_KEY}={date.date().isoformat()}")
+
+
+def _read_partition(root: str, date: pd.Timestamp, columns=None) -> pd.DataFrame:
+    return pd.read_parquet(_partition_dir(root, date), columns=columns)
+
+
+def add_snapshot(df: pd.DataFrame, scrape_date, root: str = SNAPSHOT_DIR) -> int:
+    """
+    Sparar en skrapning som partitionen för scrape_date (ersätter en tidigare bild från
+    samma datum). Returnerar antalet fartyg i bilden.
+    """
+    date = pd.Timestamp(scrape_date).normalize()
+    snap = normalize_snapshot(df)
+    os.makedirs(root, exist_ok=True)
+
+    # Partitionen skrivs i en dold katalog och byts in med ett namnbyte
+    path = _partition_dir(root, date)
+    tmp_path = _path(root, "." + os.path.basename(path) + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    snap.to_parquet(os.path.join(tmp_path, "part-0.parquet"), index=False)
+    replaced = os.path.exists(path)
+    if replaced:
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    latest = _read_parquet(_path(root, LATEST_FILE))
+    if replaced or (latest is not None and date <= latest["seen"].max()):
+        # Ersatt eller äldre bild: ändringarna efter den stämmer inte längre
+        rebuild_index(root)
+    else:
+        changes = _read_parquet(_path(root, CHANGES_FILE))
+        latest, changes = _apply_snapshot(latest, changes, snap, date)
+        _save_index(root, latest, changes, date)
+    return len(snap)
+
+
+def as_of(scrape_date, root: str = SNAPSHOT_DIR, imos=None, columns=None):
+    """
+    Varje fartygs senaste bild till och med scrape_date, med kolumnen scrape_date för
+    när den togs. imos och columns begränsar vad som läses (partitioner efter datumet
+    läses aldrig).
+    """
+    date = pd.Timestamp(scrape_date).normalize()
+    columns = list(columns or SNAPSHOT_COLUMNS)
+    if "IMO" not in columns:
+        columns = ["IMO"] + columns
+
+    dataset = ds.dataset(
+        root,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(PARTITION_KEY, pa.date32())]), flavor="hive"
+        ),
+    )
+    condition = ds.field(PARTITION_KEY) <= pa.scalar(date.date(), pa.date32())
+    if imos is not None:
+        condition = condition & ds.field("IMO").isin(pa.array(list(imos), pa.int64()))
+    table = dataset.to_table(columns=columns + [PARTITION_KEY], filter=condition)
+
+    df = table.to_pandas()
+    df[PARTITION_KEY] = pd.to_datetime(df[PARTITION_KEY])
+    df = df.sort_values(PARTITION_KEY, kind="stable")
+    return df.drop_duplicates(subset="IMO", keep="last").reset_index(drop=True)
+
+
+def changes_since(scrape_date, root: str = SNAPSHOT_DIR, columns=None) -> pd.DataFrame:
+    """Alla ändringar (IMO, scrape_date, column, old, new) efter scrape_date."""
+    changes = _read_parquet(_path(root, CHANGES_FILE))
+    if changes is None:
+        return pd.DataFrame(columns=["IMO", PARTITION_KEY, "column", "old", "new"])
+    changes = changes[changes[PARTITION_KEY] > pd.Timestamp(scrape_date)]
+    if columns is not None:
+        changes = changes[changes["column"].isin(columns)]
+    return changes.reset_index(drop=True)
+
+
+def history_features(root: str = SNAPSHOT_DIR):
+    """Bytena per IMO (index IMO, kolumner HISTORY_FEATURES), eller None utan historik."""
+    if ds is None:
+        return None
+    features = _read_parquet(_path(root, FEATURES_FILE))
+    return None if features is None else features.set_index("IMO")
+
+
+def join_history_features(
+    df: pd.DataFrame, root: str = SNAPSHOT_DIR, features=None
+) -> pd.DataFrame:
+    """
+    Lägger till HISTORY_FEATURES (0 för fartyg utan byten) om det finns en historik.
+    features är history_features() om den redan lästs in, t.ex. en gång per fil.
+    """
+    if features is None:
+        features = history_features(root)
+    if features is None:
+        return df
+    imos = pd.to_numeric(df["IMO"], errors="coerce").to_numpy()
+    joined = features.reindex(imos)  # hashuppslag per IMO
+    for col in HISTORY_FEATURES:
+        df[col] = joined[col].fillna(0).astype("int32").to_numpy()
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Historik över skrapningarna")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="spara en skrapning (CSV) som en ögonblicksbild")
+    add.add_argument("csv")
+    add.add_argument("--date", default=pd.Timestamp.today().date().isoformat())
+
+    query = sub.add_parser("as-of", help="varje fartygs senaste bild till ett datum")
+    query.add_argument("date")
+    query.add_argument("--imo", type=int, nargs="+")
+    query.add_argument("-o", "--output", help="CSV att skriva (annars skrivs de ut)")
+
+    changed = sub.add_parser("changes", help="ändringar efter ett datum")
+    changed.add_argument("--since", required=True)
+
+    sub.add_parser("rebuild", help="bygg om _latest/_changes/_features")
+    parser.add_argument("--root", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if args.command == "add":
+        n = add_snapshot(pd.read_csv(args.csv, dtype=str), args.date, args.root)
+        print(f"Sparade {n} fartyg för {args.date} i {args.root}")
+    elif args.command == "as-of":
+        df = as_of(args.date, args.root, args.imo)
+        if args.output:
+            df.to_csv(args.output, index=False)
+        else:
+            print(df.to_string())
+    elif args.command == "changes":
+        print(changes_since(args.since, args.root).to_string())
+    else:
+        rebuild_index(args.root)
@@ -1,111 +1,161 @@
 """
-import pandas as pd
-
-# Filnamn
-VESSELS_FILE = "vessels.csv"
-SHADOW_FILE = "shadow_fleet.csv"
-OUTPUT_FILE = "matched_vessels.csv"
-
-
-def clean_imo(val):
-    #Hjälpfunktion för att städa IMO-nummer till rena strängar (t.ex. '9282041')
-    try:
-        # Gör om till float först för att hantera "9282041.0", sen int, sen sträng
-        return str(int(float(val)))
-    except:
-        return str(val).strip()
+Delar upp den skrapade fartygslistan (vessels.csv) mot shadow-listan i ett enda pass:
+- shadow_vessels.csv: fartyg vars IMO finns i shadow-listan (träningsdatan)
+- unknown_vessels.csv: alla övriga, som modellen poängsätter
 
+IMO-numren normaliseras vektoriserat (9282041, "9282041.0", "IMO 9282041") och valideras
+med kontrollsiffran. Ogiltiga nummer i shadow-listan ignoreras, och fartyg med saknat
+eller ogiltigt IMO kan inte vara kända och hamnar bland de okända.
 
-def main():
-    print("Läser in filer...")
-
-    # 1. Läs in Shadow Fleet-listan (bara IMO-kolumnen behövs egentligen)
-    try:
-        shadow_df = pd.read_csv(SHADOW_FILE)
-        # Skapa en 'set' av alla IMO-nummer vi letar efter (mycket snabbare sökning)
-        target_imos = set(shadow_df["IMO"].apply(clean_imo))
-        print(f"Hittade {len(target_imos)} unika IMO-nummer i {SHADOW_FILE}.")
-    except Exception as e:
-        print(f"Fel vid inläsning av {SHADOW_FILE}: {e}")
-        return
-
-    # 2. Läs in Vessels-filen
-    try:
-        vessels_df = pd.read_csv(VESSELS_FILE)
-        # Spara originalantalet rader
-        original_count = len(vessels_df)
-    except Exception as e:
-        print(f"Fel vid inläsning av {VESSELS_FILE}: {e}")
-        return
-
-    # 3. Filtrera: Behåll bara rader där IMO finns i target_imos
-    # Vi skapar en temporär kolumn för matchning för att inte ändra originaldatan
-    vessels_df["clean_imo"] = vessels_df["IMO"].apply(clean_imo)
-
-    matched_df = vessels_df[vessels_df["clean_imo"].isin(target_imos)]
-
-    # Ta bort hjälpkolumnen igen
-    matched_df = matched_df.drop(columns=["clean_imo"])
-
-    # 4. Spara resultatet
-    matched_df.to_csv(OUTPUT_FILE, index=False)
-
-    print("-" * 30)
-    print(f"Klar! Filtrering slutförd.")
-    print(f"Originalrader i vessels.csv: {original_count}")
-    print(f"Matchade rader (Shadow Fleet): {len(matched_df)}")
-    print(f"Resultat sparat till: {OUTPUT_FILE}")
+Med --chunk-size läses fartygslistan chunkvis, så att stora register- och AIS-dumpar
+bara har shadow-listan och en chunk i minnet. Körs från projektets rot:
 
-
-if __name__ == "__main__":
-    main()
+    python scrapers/data_structurer.py [--chunk-size 500000]
 """
 
-import pandas as pd
+import argparse
+import os
+import sys
+from contextlib import ExitStack
 
-# Filnamn
-VESSELS_FILE = "vessels.csv"
-SHADOW_FILE = "shadow_fleet.csv"
-CLEAN_CANDIDATES_FILE = "unknown_vessels.csv"
+import numpy as np
+import pandas as pd
 
+# Delas med modellen: atomära filskrivningar
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+)
+from process_utils import atomic_write  # noqa: E402
 
-def clean_imo(val):
-    """Säkerställer att IMO-nummer matchar oavsett format (int/float/str)"""
-    try:
-        return str(int(float(val)))
-    except:
-        return str(val).strip()
+# Filnamn
+VESSELS_FILE = "scrapers/vessels.csv"
+SHADOW_LIST_FILE = "scrapers/shadow_fleet_imo_names.csv"
+SHADOW_FILE = "vessel_data/shadow_vessels.csv"
+CLEAN_CANDIDATES_FILE = "vessel_data/unknown_vessels.csv"
+
+CHUNK_SIZE = 500_000  # rader per chunk med --chunk-size utan värde
+
+# Kontrollsiffran är summan av de sex första siffrorna gånger 7, 6, ..., 2, modulo 10
+IMO_WEIGHTS = np.arange(7, 1, -1)
+
+
+def valid_imo(imo: np.ndarray) -> np.ndarray:
+    """True för sjusiffriga nummer vars sista siffra stämmer med kontrollsiffran."""
+    imo = np.asarray(imo, dtype=np.int64)
+    digits = imo[:, None] // 10 ** np.arange(6, -1, -1) % 10
+    check = (digits[:, :6] * IMO_WEIGHTS).sum(axis=1) % 10
+    return (imo >= 1_000_000) & (imo <= 9_999_999) & (check == digits[:, 6])
+
+
+def normalize_imo(values: pd.Series) -> pd.Series:
+    """IMO-nummer som Int64, <NA> för saknade och ogiltiga (fel format eller kontrollsiffra)."""
+    if not pd.api.types.is_numeric_dtype(values):
+        values = (
+            values.astype("string")
+            .str.strip()
+            .str.replace(r"^IMO\s*", "", case=False, regex=True)
+        )
+    numbers = pd.to_numeric(values, errors="coerce")
+    numbers = np.asarray(numbers, dtype=np.float64)
+
+    # Heltal i rätt intervall först, så att bara rimliga värden görs om till int64
+    ok = (numbers >= 1_000_000) & (numbers <= 9_999_999) & (numbers % 1 == 0)
+    ok[ok] = valid_imo(numbers[ok])
+    return pd.Series(
+        np.where(ok, numbers, np.nan), index=values.index, name=values.name
+    ).astype("Int64")
+
+
+def load_shadow_imos(shadow_list_file: str = SHADOW_LIST_FILE) -> pd.Index:
+    """De giltiga, unika IMO-numren i shadow-listan."""
+    shadow_imos = normalize_imo(pd.read_csv(shadow_list_file, usecols=["IMO"])["IMO"])
+    invalid = int(shadow_imos.isna().sum())
+    if invalid:
+        print(f"Varning: {invalid} ogiltiga IMO-nummer i {shadow_list_file} ignoreras.")
+    return pd.Index(shadow_imos.dropna().unique())
+
+
+def known_mask(imos: pd.Series, shadow_imos: pd.Index) -> np.ndarray:
+    """Semi-join mot shadow-listan (hashuppslag); ~mask är anti-joinen."""
+    return imos.isin(shadow_imos).to_numpy(dtype=bool, na_value=False)
+
+
+def split_vessels(
+    vessels_file: str = VESSELS_FILE,
+    shadow_list_file: str = SHADOW_LIST_FILE,
+    shadow_file: str = SHADOW_FILE,
+    unknown_file: str = CLEAN_CANDIDATES_FILE,
+    chunk_size: int = None,
+) -> dict:
+    """
+    Skriver de kända och de okända fartygen i ett pass över vessels_file (chunkvis om
+    chunk_size anges). Kolumnerna och IMO-värdena skrivs som de är i vessels_file.
+    Returnerar antalen.
+    """
+    shadow_imos = load_shadow_imos(shadow_list_file)
+    print(f"Hittade {len(shadow_imos)} kända shadow-fartyg.")
+
+    if chunk_size:
+        chunks = pd.read_csv(vessels_file, chunksize=chunk_size)
+    else:
+        chunks = [pd.read_csv(vessels_file)]
+
+    counts = {"vessels": 0, "known": 0, "unknown": 0, "invalid_imo": 0}
+    for path in (shadow_file, unknown_file):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # Båda filerna byts ut först när hela fartygslistan är uppdelad
+    with ExitStack() as stack:
+        shadow_out = stack.enter_context(atomic_write(shadow_file, newline=""))
+        unknown_out = stack.enter_context(atomic_write(unknown_file, newline=""))
+        for i, chunk in enumerate(chunks):
+            imos = normalize_imo(chunk["IMO"])
+            known = known_mask(imos, shadow_imos)
+
+            chunk[known].to_csv(shadow_out, header=i == 0, index=False)
+            chunk[~known].to_csv(unknown_out, header=i == 0, index=False)
+
+            counts["vessels"] += len(chunk)
+            counts["known"] += int(known.sum())
+            counts["unknown"] += int((~known).sum())
+            counts["invalid_imo"] += int(imos.isna().sum())
+
+    return counts
 
 
 def main():
-    print("Startar rensning av vessels.csv...")
-
-    # 1. Läs in Shadow Fleet-listan (dina 600 bekräftade)
-    shadow_df = pd.read_csv(SHADOW_FILE)
-    confirmed_imos = set(shadow_df["IMO"].apply(clean_imo))
-    print(f"Hittade {len(confirmed_imos)} kända shadow-fartyg.")
-
-    # 2. Läs in alla vessels
-    vessels_df = pd.read_csv(VESSELS_FILE)
-    original_count = len(vessels_df)
-
-    # 3. Filtrera bort de kända fartygen
-    # Vi behåller bara rader där IMO-numret INTE finns i confirmed_imos
-    vessels_df["tmp_imo"] = vessels_df["IMO"].apply(clean_imo)
-    unknown_vessels_df = vessels_df[~vessels_df["tmp_imo"].isin(confirmed_imos)].copy()
-
-    # Ta bort hjälpkolumnen
-    unknown_vessels_df = unknown_vessels_df.drop(columns=["tmp_imo"])
-
-    # 4. Spara den nya listan med okända fartyg
-    unknown_vessels_df.to_csv(CLEAN_CANDIDATES_FILE, index=False)
+    parser = argparse.ArgumentParser(
+        description="Delar upp vessels.csv i kända shadow-fartyg och okända fartyg"
+    )
+    parser.add_argument("--vessels", default=VESSELS_FILE)
+    parser.add_argument("--shadow-list", default=SHADOW_LIST_FILE)
+    parser.add_argument("--shadow-output", default=SHADOW_FILE)
+    parser.add_argument("--unknown-output", default=CLEAN_CANDIDATES_FILE)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        nargs="?",
+        const=CHUNK_SIZE,
+        help=f"läs fartygslistan chunkvis (standard {CHUNK_SIZE} rader per chunk)",
+    )
+    args = parser.parse_args()
+
+    print(f"Startar uppdelning av {args.vessels}...")
+    counts = split_vessels(
+        args.vessels,
+        args.shadow_list,
+        args.shadow_output,
+        args.unknown_output,
+        args.chunk_size,
+    )
 
     print("-" * 30)
-    print(f"Rensning klar!")
-    print(f"Antal fartyg från början: {original_count}")
-    print(f"Antal borttagna (kända): {original_count - len(unknown_vessels_df)}")
-    print(f"Antal kvarvarande okända: {len(unknown_vessels_df)}")
-    print(f"Resultat sparat till: {CLEAN_CANDIDATES_FILE}")
+    print("Uppdelning klar!")
+    print(f"Antal fartyg från början: {counts['vessels']}")
+    print(f"Antal kända (shadow): {counts['known']} -> {args.shadow_output}")
+    print(f"Antal okända: {counts['unknown']} -> {args.unknown_output}")
+    if counts["invalid_imo"]:
+        print(f"Varav med saknat/ogiltigt IMO: {counts['invalid_imo']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,351 @@
+"""
+Concurrent, resumable scraping engine for the VesselFinder vessel listings.
+
+Listing pages are fetched by a bounded pool of worker threads and parsed straight from
+the page source with lxml, in one pass per page. Requests to each host are spaced by a
+shared rate limiter, and transient failures (timeouts, HTTP 429/5xx, captchas) are
+retried with exponential backoff. Every page is upserted into the scrape store
+(scrape_store.py) and then recorded in a checkpoint file, so an interrupted scrape
+resumes where it stopped.
+
+Fetchers:
+- ChromeFetcher: the existing Chrome in remote debugging mode, via Selenium. All workers
+  share one tab, so pages load one at a time but are parsed in parallel.
+- HttpFetcher: plain HTTP(S) with requests. Much faster, but the site may answer with
+  a captcha.
+- FixtureFetcher: saved listing pages (scrapers/fixtures/page_<n>.html), for running
+  the whole engine offline.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlsplit
+
+import lxml.html
+from lxml import etree
+
+# Shared with the model: atomic file writes
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+)
+from process_utils import atomic_write  # noqa: E402
+
+LISTING_URL = (
+    "https://www.vesselfinder.com/vessels"
+    "?page={page}&minYear=1960&minLength=150&type=6&sort=5&dir=1"
+)
+CSV_FILENAME = "vesselfinder_tankers_full.csv"
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+COLUMNS = ["IMO", "Name", "Type", "Flag", "Built", "GT", "DWT", "Size"]
+FIELD_CLASSES = {
+    "Name": "slna",
+    "Type": "slty",
+    "Built": "v3",
+    "GT": "v4",
+    "DWT": "v5",
+    "Size": "v6",
+}
+CAPTCHA_MARKER = "Verify you are human"
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 1.0  # requests per second and host
+MAX_RETRIES = 4
+BACKOFF_BASE = 2.0  # seconds before the first retry, doubled for every attempt
+BACKOFF_MAX = 60.0
+REQUEST_TIMEOUT = 30
+SCROLL_POLL = 0.25  # seconds between lazy-loading checks in Chrome
+SCROLL_TIMEOUT = 10.0
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Compiled once; evaluated per row on the parsed page instead of a round-trip per element
+ROW_XPATH = etree.XPath(f"//tr[.//a[{_has_class('ship-link')}]]")
+LINK_XPATH = etree.XPath(f".//a[{_has_class('ship-link')}]/@href")
+FLAG_XPATH = etree.XPath(f".//*[{_has_class('flag-icon')}]/@title")
+FIELD_XPATHS = {
+    col: etree.XPath(f".//*[{_has_class(cls)}]") for col, cls in FIELD_CLASSES.items()
+}
+
+
+class FetchError(Exception):
+    """A page could not be fetched. retryable=False for errors a retry will not fix."""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def parse_listing(html: str) -> list[dict]:
+    """All vessel rows on a listing page, in the same format as the CSV."""
+    if not html.strip():
+        return []
+    vessels = []
+    for row in ROW_XPATH(lxml.html.fromstring(html)):
+        fields = {}
+        for col, xpath in FIELD_XPATHS.items():
+            elements = xpath(row)
+            if not elements:
+                break  # not a complete vessel row
+            fields[col] = elements[0].text_content().strip()
+        else:
+            href = LINK_XPATH(row)[0]
+            flag = FLAG_XPATH(row)
+            fields["IMO"] = href.rstrip("/").split("/")[-1] if href else "N/A"
+            fields["Flag"] = flag[0] if flag else "Unknown"
+            vessels.append({col: fields[col] for col in COLUMNS})
+    return vessels
+
+
+class RateLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart, across all workers."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, jitter: float = 0.25):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.jitter = jitter
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        # Reserve the next slot under the lock, then sleep without holding it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            spacing = self.interval * (1 + random.uniform(0, self.jitter))
+            self._next[host] = slot + spacing
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpFetcher:
+    """Fetches pages with requests, one session per worker thread."""
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT):
+        import requests
+
+        self.requests = requests
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            session = self.requests.Session()
+            session.headers["User-Agent"] = (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+            )
+            self._local.session = session
+        return self._local.session
+
+    def fetch(self, url: str) -> str:
+        try:
+            response = self._session().get(url, timeout=self.timeout)
+        except self.requests.RequestException as e:
+            raise FetchError(str(e))
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After", "")
+            raise FetchError(
+                f"HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after.isdigit() else None,
+            )
+        if response.status_code >= 400:
+            raise FetchError(f"HTTP {response.status_code}", retryable=False)
+        return response.text
+
+
+class ChromeFetcher:
+    """
+    Fetches pages through Chrome running with --remote-debugging-port. The tab is
+    shared, so page loads are serialized; the captcha prompt is kept from the old
+    scraper since a human has to solve it in the browser.
+    """
+
+    def __init__(self, debugger_address: str = "127.0.0.1:9222"):
+        from selenium import webdriver
+        from selenium.common.exceptions import WebDriverException
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_experimental_option("debuggerAddress", debugger_address)
+        self.driver = webdriver.Chrome(options=chrome_options)
+        self.driver_error = WebDriverException
+        self._lock = threading.Lock()
+
+    def _load(self, url: str) -> str:
+        self.driver.get(url)
+        # Scroll until the row count stops growing instead of sleeping a fixed time
+        count = -1
+        deadline = time.monotonic() + SCROLL_TIMEOUT
+        while time.monotonic() < deadline:
+            self.driver.execute_script(
+                "window.scrollTo(0, document.body.scrollHeight);"
+            )
+            time.sleep(SCROLL_POLL)
+            loaded = self.driver.execute_script(
+                "return document.querySelectorAll('a.ship-link').length;"
+            )
+            if loaded == count:
+                break
+            count = loaded
+        return self.driver.page_source
+
+    def fetch(self, url: str) -> str:
+        with self._lock:
+            try:
+                html = self._load(url)
+                if CAPTCHA_MARKER in html:
+                    input(
+                        "Captcha detected! Solve it in the browser, then press ENTER here..."
+                    )
+                    html = self._load(url)
+            except self.driver_error as e:
+                raise FetchError(str(e))
+        return html
+
+
+class FixtureFetcher:
+    """Serves saved listing pages; a page without a file is an empty listing."""
+
+    def __init__(self, directory: str = FIXTURE_DIR):
+        self.directory = directory
+
+    def fetch(self, url: str) -> str:
+        page = parse_qs(urlsplit(url).query).get("page", ["1"])[0]
+        path = os.path.join(self.directory, f"page_{page}.html")
+        if not os.path.exists(path):
+            return ""
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+
+class Checkpoint:
+    """
+    The pages that are finished (their rows written to the output) and the pages that
+    failed or had no vessels, for one listing URL. Saved atomically as JSON after every page.
+    """
+
+    def __init__(self, path: str, url_template: str):
+        self.path = path
+        self.url_template = url_template
+        self.done = {}
+        self.failed = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state["url_template"] != url_template:
+                raise SystemExit(
+                    f"{path} belongs to another listing URL, run with --fresh to start over."
+                )
+            self.done = {int(page): rows for page, rows in state["done"].items()}
+            self.failed = {int(page): error for page, error in state["failed"].items()}
+
+    def is_done(self, page: int) -> bool:
+        return page in self.done
+
+    def mark_done(self, page: int, rows: int) -> None:
+        self.done[page] = rows
+        self.failed.pop(page, None)
+
+    def mark_failed(self, page: int, error: str) -> None:
+        self.failed[page] = error
+
+    def save(self) -> None:
+        state = {
+            "url_template": self.url_template,
+            "done": {str(page): rows for page, rows in sorted(self.done.items())},
+            "failed": {str(page): error for page, error in sorted(self.failed.items())},
+        }
+        with atomic_write(self.path) as f:
+            json.dump(state, f, indent=2)
+
+
+def fetch_page(
+    fetcher, url: str, limiter: RateLimiter, max_retries: int = MAX_RETRIES
+) -> list[dict]:
+    """Fetches and parses one page, retrying with exponential backoff and jitter."""
+    for attempt in range(max_retries + 1):
+        limiter.wait(url)
+        try:
+            html = fetcher.fetch(url)
+            if CAPTCHA_MARKER in html:
+                raise FetchError("captcha")
+            return parse_listing(html)
+        except FetchError as e:
+            if not e.retryable or attempt == max_retries:
+                raise
+            backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+            time.sleep(e.retry_after or backoff * random.uniform(0.5, 1.0))
+
+
+def scrape_pages(
+    pages,
+    fetcher,
+    store,
+    checkpoint: Checkpoint,
+    workers: int = DEFAULT_WORKERS,
+    rate: float = DEFAULT_RATE,
+    max_retries: int = MAX_RETRIES,
+) -> dict:
+    """
+    Scrapes every page that is not already done in the checkpoint into store (a
+    ScrapeStore, see scrape_store.py). Workers only fetch and parse; each page is written
+    and then marked done from this thread, in page order. Returns the counts.
+    """
+    limiter = RateLimiter(rate)
+    todo = [page for page in pages if not checkpoint.is_done(page)]
+    counts = {"pages": 0, "rows": 0, "failed": 0, "skipped": len(pages) - len(todo)}
+    if counts["skipped"]:
+        print(f"Resuming: {counts['skipped']} pages already done.")
+
+    def work(page):
+        url = checkpoint.url_template.format(page=page)
+        return fetch_page(fetcher, url, limiter, max_retries)
+
+    def record(page, rows, error):
+        if error is None and not rows:
+            # Past the last page, or a page that did not load: retried on the next run
+            error = "no vessels on the page"
+        if error is not None:
+            checkpoint.mark_failed(page, str(error))
+            counts["failed"] += 1
+            print(f"Page {page} failed: {error}")
+        else:
+            store.write(rows)
+            checkpoint.mark_done(page, len(rows))
+            counts["pages"] += 1
+            counts["rows"] += len(rows)
+            print(f"Scraped page {page}: {len(rows)} ships")
+        checkpoint.save()
+
+    # Pages finish in any order but are written in listing order, so the store (and the
+    # exported CSV) keeps the site's order. Finished pages wait here for earlier ones.
+    finished = {}
+    next_index = 0
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = {pool.submit(work, page): page for page in todo}
+    try:
+        for future in as_completed(futures):
+            try:
+                finished[futures[future]] = (future.result(), None)
+            except FetchError as e:
+                finished[futures[future]] = (None, e)
+            while next_index < len(todo) and todo[next_index] in finished:
+                page = todo[next_index]
+                record(page, *finished.pop(page))
+                next_index += 1
+    except KeyboardInterrupt:
+        print("Stopped by user. Finished pages are saved, run again to resume.")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return counts
@@ -0,0 +1,107 @@
+"""
+Append-only storage for scraped vessels in SQLite.
+
+Each page is written in its own transaction as an upsert on the IMO primary key, so
+persisting a page costs O(rows on the page) however long the scrape has run, and every
+committed page survives a crash (WAL journal). A vessel that shows up again (it moved
+between pages, or the page was scraped again after a resume) keeps its first position
+but gets the latest values.
+
+compact() folds the write-ahead log back into the database and reclaims free pages;
+export_csv() writes the CSV the rest of the pipeline reads:
+
+    python scrapers/scrape_store.py vesselfinder_tankers_full.sqlite -o vesselfinder_tankers_full.csv
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from process_utils import atomic_write  # on sys.path via scrape_engine
+from scrape_engine import COLUMNS
+
+EXPORT_CHUNK_ROWS = 100_000
+
+_COLUMN_LIST = ", ".join(f'"{col}"' for col in COLUMNS)
+_UPSERT = (
+    f"INSERT INTO vessels ({_COLUMN_LIST}, scraped_at) "
+    f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) "
+    "ON CONFLICT(IMO) DO UPDATE SET "
+    + ", ".join(f'"{col}" = excluded."{col}"' for col in COLUMNS[1:] + ["scraped_at"])
+)
+
+
+class ScrapeStore:
+    """Scraped vessels keyed on IMO. write() is called once per page."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # durable per commit with WAL
+        columns = ", ".join(f'"{col}" TEXT' for col in COLUMNS[1:])
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS vessels ("IMO" TEXT PRIMARY KEY, {columns}, '
+            "scraped_at TEXT)"
+        )
+        self.conn.commit()
+
+    def write(self, rows: list[dict]) -> None:
+        """Upserts one page of rows in a single transaction."""
+        if not rows:
+            return
+        scraped_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                _UPSERT,
+                [[row[col] for col in COLUMNS] + [scraped_at] for row in rows],
+            )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM vessels").fetchone()[0]
+
+    def compact(self) -> None:
+        """Merges the WAL into the database file and reclaims unused space."""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("VACUUM")
+
+    def export_csv(self, csv_path: str) -> int:
+        """Writes all vessels, in first-seen order, to csv_path. Returns the row count."""
+        query = f"SELECT {_COLUMN_LIST} FROM vessels ORDER BY rowid"
+        n_rows = 0
+        with atomic_write(csv_path, newline="", encoding="utf-8") as f:
+            for chunk in pd.read_sql_query(
+                query, self.conn, chunksize=EXPORT_CHUNK_ROWS
+            ):
+                chunk.to_csv(f, header=n_rows == 0, index=False)
+                n_rows += len(chunk)
+            if n_rows == 0:
+                f.write(",".join(COLUMNS) + "\n")
+        return n_rows
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def remove_store(path: str) -> None:
+    """Deletes the database together with its WAL and shared-memory files."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compact a scrape store and export it to CSV"
+    )
+    parser.add_argument("store", help="SQLite file written by vesselfinder_scraper.py")
+    parser.add_argument("-o", "--output", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    store = ScrapeStore(args.store)
+    store.compact()
+    print(f"Exported {store.export_csv(args.output)} vessels to {args.output}")
+    store.close()
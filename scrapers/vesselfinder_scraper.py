@@ -1,89 +1,95 @@
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-import time
-import random
+import argparse
+import os
 
-# 1. Connect to your existing Chrome
+from scrape_engine import (
+    CSV_FILENAME,
+    DEFAULT_RATE,
+    DEFAULT_WORKERS,
+    FIXTURE_DIR,
+    LISTING_URL,
+    MAX_RETRIES,
+    Checkpoint,
+    ChromeFetcher,
+    FixtureFetcher,
+    HttpFetcher,
+    scrape_pages,
+)
+from scrape_store import ScrapeStore, remove_store
+
+# 1. Connect to your existing Chrome (default --source chrome)
 # Open chrome with this line "C:\Program Files\Google\Chrome\Application\chrome.exe" --remote-debugging-port=9222 --user-data-dir="C:\temp_chrome"
 # go to localhost:9222
 # start this python program
 # navigate to vesselfinder
 # start to scrape
-chrome_options = Options()
-chrome_options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
-driver = webdriver.Chrome(options=chrome_options)
+#
+# --source http fetches the listing pages directly (no browser), --source fixtures
+# reads the saved pages in scrapers/fixtures/ so the whole run works offline.
+# Each page is upserted into <output>.sqlite and recorded in <output>.checkpoint.json:
+# run again to resume. The CSV is exported from the store when the run ends.
 
-all_vessels = []
-CSV_FILENAME = "vesselfinder_tankers_full.csv"
+parser = argparse.ArgumentParser(description="Scrape the VesselFinder tanker listings")
+parser.add_argument("--start", type=int, help="first page (asked for if not given)")
+parser.add_argument("--end", type=int, help="last page (asked for if not given)")
+parser.add_argument(
+    "--source", choices=["chrome", "http", "fixtures"], default="chrome"
+)
+parser.add_argument(
+    "--fixtures", default=FIXTURE_DIR, help="directory for --source fixtures"
+)
+parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+parser.add_argument(
+    "--rate",
+    type=float,
+    default=DEFAULT_RATE,
+    help="requests per second (0 = no limit)",
+)
+parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+parser.add_argument("--output", default=CSV_FILENAME)
+parser.add_argument(
+    "--fresh", action="store_true", help="ignore the checkpoint and start over"
+)
+args = parser.parse_args()
 
 # 2. Set your range
-start_page = int(input("Enter the page number you are currently on: "))
-end_page = int(input("Enter the page number to stop at: "))
-
-try:
-    for p in range(start_page, end_page + 1):
-        url = f"https://www.vesselfinder.com/vessels?page={p}&minYear=1960&minLength=150&type=6&sort=5&dir=1"
-        print(f"--- Navigating to Page {p} ---")
-        driver.get(url)
-
-        print("Scrolling to load all data...")
-        # Scroll down in increments to trigger lazy-loading
-        for i in range(1, 5):
-            driver.execute_script(
-                f"window.scrollTo(0, document.body.scrollHeight * {i/4});"
-            )
-            time.sleep(0.5)
-        time.sleep(1)  # Wait a bit for any remaining data to load
-
-        if "Verify you are human" in driver.page_source:
-            input("Captcha detected! Solve it in the browser, then press ENTER here...")
-
-        # 3. Scrape the rows
-        rows = driver.find_elements(
-            By.XPATH, "//tr[descendant::a[contains(@class, 'ship-link')]]"
-        )
-
-        for row in rows:
-            try:
-                link_element = row.find_element(By.CLASS_NAME, "ship-link")
-                ship_url = link_element.get_attribute("href")
-                imo = ship_url.split("/")[-1] if ship_url else "N/A"
-                try:
-                    flag_element = row.find_element(By.CLASS_NAME, "flag-icon")
-                    flag_land = flag_element.get_attribute("title")
-                except:
-                    flag_land = "Unknown"
-
-                all_vessels.append(
-                    {
-                        "IMO": imo,
-                        "Name": row.find_element(By.CLASS_NAME, "slna").text.strip(),
-                        "Type": row.find_element(By.CLASS_NAME, "slty").text.strip(),
-                        "Flag": flag_land,
-                        "Built": row.find_element(By.CLASS_NAME, "v3").text.strip(),
-                        "GT": row.find_element(By.CLASS_NAME, "v4").text.strip(),
-                        "DWT": row.find_element(By.CLASS_NAME, "v5").text.strip(),
-                        "Size": row.find_element(By.CLASS_NAME, "v6").text.strip(),
-                    }
-                )
-            except:
-                continue
+start_page = args.start or int(input("Enter the page number you are currently on: "))
+end_page = args.end or int(input("Enter the page number to stop at: "))
 
-        print(f"Successfully scraped page {p}. Total ships: {len(all_vessels)}")
+base = os.path.splitext(args.output)[0]
+store_file = base + ".sqlite"
+checkpoint_file = args.output + ".checkpoint.json"
+if args.fresh:
+    remove_store(store_file)
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
 
-        if p % 5 == 0:
-            pd.DataFrame(all_vessels).drop_duplicates(subset=["IMO"]).to_csv(
-                CSV_FILENAME, index=False
-            )
-            print("--- Progress saved to CSV ---")
+if args.source == "chrome":
+    fetcher = ChromeFetcher()
+elif args.source == "http":
+    fetcher = HttpFetcher()
+else:
+    fetcher = FixtureFetcher(args.fixtures)
 
-except KeyboardInterrupt:
-    print("Stopped by user.")
+# 3. Scrape the pages
+checkpoint = Checkpoint(checkpoint_file, LISTING_URL)
+store = ScrapeStore(store_file)
+counts = scrape_pages(
+    range(start_page, end_page + 1),
+    fetcher,
+    store,
+    checkpoint,
+    workers=args.workers,
+    rate=args.rate,
+    max_retries=args.retries,
+)
 
-finally:
-    if all_vessels:
-        df = pd.DataFrame(all_vessels).drop_duplicates(subset=["IMO"])
-        df.to_csv(CSV_FILENAME, index=False)
-        print(f"Finished. Total unique ships saved: {len(df)}")
+# 4. Compact the store and export the CSV
+store.compact()
+total = store.export_csv(args.output)
+store.close()
+print(
+    f"Finished. {counts['pages']} pages scraped, {counts['skipped']} already done, "
+    f"{counts['failed']} failed. Total unique ships saved: {total}"
+)
+if checkpoint.failed:
+    print(f"Failed pages (run again to retry): {sorted(checkpoint.failed)}")
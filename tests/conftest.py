@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "model")]
+
+# Ingen bevakningstråd när app.py importeras, och datafilerna läses från projektets rot
+os.environ.setdefault("SHADOW_FLEET_RELOAD_INTERVAL", "0")
+os.chdir(ROOT)
@@ -0,0 +1,55 @@
+import app
+
+
+def test_score_without_imo_or_particulars_is_rejected():
+    client = app.server.test_client()
+    assert client.get("/api/score").status_code == 400
+    assert client.post("/api/score", json={}).status_code == 400
+
+
+def test_score_rejects_unknown_fields():
+    client = app.server.test_client()
+    response = client.get("/api/score?imo_number=9299941")
+    assert response.status_code == 400
+    assert "imo_number" in response.get_json()["error"]
+    response = client.post("/api/score", json=[{"IMO": 9299941}, {"flg": "Panama"}])
+    assert response.status_code == 400
+
+
+def test_score_rejects_values_that_are_not_numbers_or_scalars():
+    client = app.server.test_client()
+    for url in (
+        "/api/score?built=xyz",
+        "/api/score?type=Crude%20Oil%20Tanker&dwt=abc",
+        "/api/score?flag=Panama&size=long%20/%2040",
+    ):
+        assert client.get(url).status_code == 400, url
+    for vessel in (
+        {"DWT": "abc"},
+        {"Flag": "Panama", "Length": "nan"},
+        {"Type": ["Crude Oil Tanker"]},
+        {"Flag": {"name": "Panama"}},
+        {"Flag": "Panama", "Built": True},
+    ):
+        assert client.post("/api/score", json=vessel).status_code == 400, vessel
+
+
+def test_score_rejects_boolean_and_fractional_imo():
+    client = app.server.test_client()
+    for imo in (9299941.7, True, "9299941.7", [9299941]):
+        response = client.post("/api/score", json={"IMO": imo})
+        assert response.status_code == 400, imo
+        assert "Invalid IMO" in response.get_json()["error"]
+
+
+def test_score_accepts_valid_particulars():
+    client = app.server.test_client()
+    # 200, eller 503 om ingen modell har sparats än
+    response = client.get(
+        "/api/score?type=Crude%20Oil%20Tanker&flag=Panama&built=2005"
+        "&dwt=106,650&size=247%20/%2042"
+    )
+    assert response.status_code in (200, 503)
+    imo = int(app.fleet.df["IMO"].iloc[0])
+    response = client.post("/api/score", json={"IMO": float(imo)})
+    assert response.status_code in (200, 503)
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks"))
+
+import app
+import run_benchmarks
+
+
+def test_benchmark_runs_end_to_end(monkeypatch):
+    monkeypatch.setitem(run_benchmarks.FLEET_SIZES, "smoke", 300)
+    # bench_size byter ut app.fleet; återställs efter testet
+    monkeypatch.setattr(app, "fleet", app.fleet)
+    results = run_benchmarks.bench_size("smoke", [0.0, 0.5], 1, 1, True)
+
+    stages = {result["stage"] for result in results}
+    assert {"model_building", "fleet_index", "fleet_search"} <= stages
+    assert "callback:update_table" in stages
+    assert all(result["seconds"] >= 0 for result in results)
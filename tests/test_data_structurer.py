@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "scrapers"))
+
+from data_structurer import normalize_imo, valid_imo
+
+VALID = [9282041, 9299941, 1064546]
+
+
+def test_valid_imo():
+    assert valid_imo(np.array(VALID)).all()
+    # Fel kontrollsiffra, och nummer som inte har sju siffror
+    assert not valid_imo(np.array([9282042, 9299940])).any()
+    assert not valid_imo(np.array([928204, 92820410, 0])).any()
+
+
+def test_normalize_imo_strings():
+    values = pd.Series(
+        [
+            "9282041",
+            " IMO 9299941 ",
+            "imo1064546",
+            "9282041.0",
+            "9282042",
+            "928204",
+            "",
+        ],
+        name="IMO",
+    )
+    result = normalize_imo(values)
+    assert str(result.dtype) == "Int64" and result.name == "IMO"
+    assert result.tolist()[:4] == [9282041, 9299941, 1064546, 9282041]
+    assert result[4:].isna().all()
+
+
+def test_normalize_imo_floats_and_nan():
+    # IMO-kolumner med saknade värden läses in som float64
+    values = pd.Series([9282041.0, np.nan, 9299941.5, 92820410.0, 1064546.0])
+    result = normalize_imo(values)
+    assert result[0] == 9282041 and result[4] == 1064546
+    assert result[[1, 2, 3]].isna().all()
+
+
+def test_normalize_imo_keeps_index():
+    values = pd.Series(["9282041", None], index=[10, 20], dtype=object)
+    result = normalize_imo(values)
+    assert list(result.index) == [10, 20]
+    assert result[10] == 9282041 and pd.isna(result[20])
@@ -0,0 +1,34 @@
+import pandas as pd
+
+import app
+
+
+def test_operator_words_inside_value_are_not_operators():
+    assert app.split_filter_part('{Flag} contains "Isle of Man"') == (
+        "Flag",
+        "contains",
+        "Isle of Man",
+    )
+    assert app.split_filter_part("{Name} icontains marshall ne le ge") == (
+        "Name",
+        "icontains",
+        "marshall ne le ge",
+    )
+
+
+def test_symbols_and_prefixes():
+    assert app.split_filter_part("{Age} > 20") == ("Age", "gt", 20.0)
+    assert app.split_filter_part("{Age}>=20") == ("Age", "ge", 20.0)
+    assert app.split_filter_part("{GT} s< 5000") == ("GT", "lt", 5000.0)
+    assert app.split_filter_part("{Flag} ieq Panama") == ("Flag", "eq", "Panama")
+    assert app.split_filter_part("Age > 20") == [None] * 3
+
+
+def test_filter_mask_with_operator_word_in_value():
+    frame = pd.DataFrame(
+        {"Flag": ["Isle of Man", "Panama", "Marshall Islands"], "Age": [5, 25, 30]}
+    )
+    mask = app.filter_mask(frame, '{Flag} contains "Isle of Man"')
+    assert mask.tolist() == [True, False, False]
+    mask = app.filter_mask(frame, "{Flag} icontains isle && {Age} < 10")
+    assert mask.tolist() == [True, False, False]
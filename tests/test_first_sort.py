@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import first_sort
+from snapshot_store import HISTORY_FEATURES, add_snapshot
+
+RAW_FILE = first_sort.UNKNOWN_FILE
+
+
+@pytest.fixture
+def raw():
+    return pd.read_csv(RAW_FILE, nrows=6)
+
+
+@pytest.mark.parametrize("size", ["-", np.nan])
+def test_clean_frame_chunk_without_any_size(raw, size):
+    raw["Size"] = size
+    df = first_sort.clean_frame(raw, 0)
+    assert "Size" not in df.columns
+    assert df["Length"].isna().all() and df["Width"].isna().all()
+    assert df["Length"].dtype == "float64"
+
+
+def test_stream_chunks_get_the_same_features_as_batch(raw, tmp_path, monkeypatch):
+    raw.loc[[1, 3], "Size"] = "-"
+    csv_file = tmp_path / "vessels.csv"
+    raw.to_csv(csv_file, index=False)
+
+    # Historik i arbetskatalogen (SNAPSHOT_DIR är relativ): första fartyget byter flagga
+    monkeypatch.chdir(tmp_path)
+    add_snapshot(raw, "2025-01-01")
+    changed = raw.copy()
+    changed.loc[0, "Flag"] = "Changed Flag"
+    add_snapshot(changed, "2025-06-01")
+
+    batch = first_sort.load_and_clean(str(csv_file), 0)
+    stream = pd.concat(first_sort.iter_chunks(str(csv_file), 2), ignore_index=True)
+
+    assert batch[HISTORY_FEATURES].to_numpy().sum() > 0
+    columns = first_sort.FEATURES + HISTORY_FEATURES
+    pd.testing.assert_frame_equal(batch[columns], stream[columns])
+
+
+# Modellhashar är hexsträngar (training_hash); fingeravtrycket saltas med de 16 första
+HASH_A, HASH_B = "a" * 32, "b" * 32
+
+
+class CountingModel:
+    """Ger varje fartyg byggåret som poäng och räknar raderna som poängsätts."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict_proba(self, X):
+        self.rows += len(X)
+        p = (X["Built"].fillna(2000).to_numpy() - 1900) / 200
+        return np.column_stack([1 - p, p])
+
+
+def test_incremental_prediction_rescores_only_changed_rows(tmp_path):
+    df = first_sort.clean_frame(pd.read_csv(RAW_FILE, nrows=50), 0)
+    df = df.drop_duplicates(subset="IMO").reset_index(drop=True)
+    features = first_sort.FEATURES
+    previous_file = str(tmp_path / "vessels_with_score.csv")
+
+    model = CountingModel()
+    scored, n_scored = first_sort.incremental_prediction(
+        df, features, model, HASH_A, previous_file
+    )
+    assert n_scored == model.rows == len(df)
+    scored.to_csv(previous_file, index=False)
+
+    # Ett ändrat och ett nytt fartyg: bara de två poängsätts
+    changed = df.copy()
+    changed.loc[3, "Built"] = changed.loc[3, "Built"] + 1
+    new = df.iloc[[0]].assign(IMO=1000019)
+    changed = pd.concat([changed, new], ignore_index=True)
+    model = CountingModel()
+    rescored, n_scored = first_sort.incremental_prediction(
+        changed, features, model, HASH_A, previous_file
+    )
+    assert n_scored == model.rows == 2
+    expected = model.predict_proba(changed[features])[:, 1]
+    by_imo = rescored.set_index("IMO")["Shadow_Probability"]
+    np.testing.assert_allclose(by_imo.loc[changed["IMO"]].to_numpy(), expected)
+
+    # En ny modell (nytt hash) poängsätter om allt
+    model = CountingModel()
+    _, n_scored = first_sort.incremental_prediction(
+        changed, features, model, HASH_B, previous_file
+    )
+    assert n_scored == len(changed)
+
+
+def test_fingerprint_changes_only_with_features(raw):
+    df = first_sort.clean_frame(raw, 0)
+    before = first_sort.feature_fingerprint(df, first_sort.FEATURES, HASH_A)
+    df.loc[1, "DWT"] = df.loc[1, "DWT"] + 1
+    df.loc[2, "Name"] = "ANOTHER NAME"  # inte en feature
+    after = first_sort.feature_fingerprint(df, first_sort.FEATURES, HASH_A)
+    assert (before != after).tolist() == [i == 1 for i in range(len(df))]
+
+
+def test_reused_model_gets_the_requested_n_jobs(tmp_path, monkeypatch):
+    shadow = first_sort.load_and_clean(first_sort.SHADOW_FILE, 1)
+    unknown = first_sort.load_and_clean(RAW_FILE, 0).head(300)
+    train_df = pd.concat([shadow, unknown])
+
+    # Modellfilerna och cachen är relativa: en egen projektkatalog i tmp_path
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "model").mkdir()
+    params = {**first_sort.RF_PARAMS, "n_estimators": 5, "n_jobs": 1}
+    first_sort.train_or_load_model(train_df, first_sort.FEATURES, params)
+
+    model, _ = first_sort.train_or_load_model(
+        train_df, first_sort.FEATURES, {**params, "n_jobs": 2}
+    )
+    assert model.named_steps["classifier"].n_jobs == 2
+
+
+def test_scoring_input_outside_the_data_dir_writes_no_arrow(raw, tmp_path):
+    csv_file = tmp_path / "fleet.csv"
+    raw.to_csv(csv_file, index=False)
+    assert first_sort.scoring_input(str(csv_file)) == str(csv_file)
+    assert list(tmp_path.iterdir()) == [csv_file]
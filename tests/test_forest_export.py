@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from first_sort import FEATURES, RF_PARAMS, build_pipeline
+from forest_export import FastForest, export_forest
+
+
+def make_vessels(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "Type": rng.choice(["Crude Oil Tanker", "Chemical Tanker", None], n_rows),
+            "Flag": rng.choice(["Panama", "Liberia", "Malta", "Unknown"], n_rows),
+            "Built": rng.integers(1985, 2025, n_rows).astype(float),
+            "DWT": rng.uniform(5_000, 300_000, n_rows),
+            "Length": rng.uniform(90, 330, n_rows),
+        }
+    )
+    for col in ["Built", "DWT", "Length"]:
+        df.loc[rng.random(n_rows) < 0.1, col] = np.nan
+    y = ((df["Built"].fillna(2000) < 2005) & (df["Flag"] != "Malta")).astype(int)
+    return df, y
+
+
+def test_fast_forest_matches_pipeline(tmp_path):
+    X, y = make_vessels(400, 0)
+    params = {**RF_PARAMS, "n_estimators": 25, "n_jobs": 1}
+    model = build_pipeline(X, params).fit(X, y)
+
+    X_test, _ = make_vessels(200, 1)
+    # Kategorier som inte fanns vid träningen och rader med bara saknade värden
+    X_test.loc[:9, "Flag"] = "Atlantis"
+    X_test.loc[10:19, "Type"] = "Submarine"
+    X_test.loc[20:24, FEATURES] = np.nan
+
+    expected = model.predict_proba(X_test[FEATURES])[:, 1]
+    forest = export_forest(model)
+    assert np.allclose(forest.predict_proba(X_test[FEATURES]), expected)
+
+    # Samma resultat efter att ha sparats och lästs in, och för en rad i taget
+    path = str(tmp_path / "forest.npz")
+    forest.save(path)
+    loaded = FastForest.load(path)
+    assert np.allclose(loaded.predict_proba(X_test[FEATURES]), expected)
+    assert np.allclose(loaded.predict_proba(X_test[FEATURES].iloc[[20]]), expected[20])
@@ -0,0 +1,27 @@
+import dash
+
+import app
+
+
+def test_version_key_orders_by_latest_mtime():
+    assert app.version_key("1.0;None;3.0") > app.version_key("2.0;2.5;None")
+    assert app.version_key(None) == 0.0
+
+
+def test_client_never_goes_back_to_an_older_version():
+    current = app.fleet.version
+    newer = ";".join(
+        str(app.version_key(current) + 60) if mtime != "None" else mtime
+        for mtime in current.split(";")
+    )
+    assert app.check_data_version(1, newer) is dash.no_update
+    assert app.check_data_version(1, current) is dash.no_update
+
+
+def test_malformed_version_counts_as_oldest():
+    assert app.version_key("bench-8k") < app.version_key(app.fleet.version)
+    assert app.version_key("abc;1.0") < app.version_key(None)
+    assert app.version_key("inf") < app.version_key(None)
+    # Klienten får den aktuella versionen, och ingen omladdning startas
+    assert app.check_data_version(1, "bench-8k") == app.fleet.version
+    assert app.fleet_for("bench-8k") is app.fleet
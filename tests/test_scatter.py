@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+import app
+
+
+def make_fleet(n_rows):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "IMO": np.arange(9_000_000, 9_000_000 + n_rows),
+            "Name": [f"VESSEL {i}" for i in range(n_rows)],
+            "Type": rng.choice(["Crude Oil Tanker", "Oil Products Tanker"], n_rows),
+            "Shadow_Probability": rng.random(n_rows),
+            "Flag": rng.choice(["Panama", "Liberia", "Malta"], n_rows),
+            # Klumpad data: de flesta fartyg hamnar i samma få rutor
+            "Age": rng.choice([5.0, 10.0, 20.0], n_rows),
+            "GT": rng.choice([30_000.0, 60_000.0], n_rows),
+        }
+    )
+    frame.loc[:9, ["Age", "GT"]] = [[40.0, 300_000.0]] * 10  # outliers
+    return app.FleetIndex(frame)
+
+
+def test_scatter_point_count_never_decreases():
+    for fleet in (make_fleet(3 * app.SCATTER_MAX_POINTS), app.fleet):
+        counts = [
+            len(fleet.scatter_rows(n))
+            for n in range(0, len(fleet.df) + 1, max(len(fleet.df) // 200, 1))
+        ]
+        assert counts == sorted(counts)
+        assert max(counts) == min(len(fleet.df), app.SCATTER_MAX_POINTS)
+
+
+def test_scatter_keeps_outliers():
+    fleet = make_fleet(3 * app.SCATTER_MAX_POINTS)
+    rows = fleet.scatter_rows(len(fleet.df))
+    kept = fleet.df.iloc[rows]
+    assert (kept["GT"] == 300_000.0).any()
+    assert len(np.unique(rows)) == len(rows)
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), "scrapers"))
+
+from scrape_engine import (
+    COLUMNS,
+    FIXTURE_DIR,
+    LISTING_URL,
+    Checkpoint,
+    FixtureFetcher,
+    parse_listing,
+    scrape_pages,
+)
+from scrape_store import ScrapeStore
+
+# Fixturerna är de första raderna i vessels.csv, i samma ordning
+VESSELS = pd.read_csv(
+    os.path.join(os.path.dirname(FIXTURE_DIR), "vessels.csv"), dtype=str
+).fillna("")
+
+
+class RecordingFetcher(FixtureFetcher):
+    def __init__(self):
+        super().__init__()
+        self.pages = []
+
+    def fetch(self, url):
+        self.pages.append(int(url.split("page=")[1].split("&")[0]))
+        return super().fetch(url)
+
+
+def fixture_rows(page):
+    with open(os.path.join(FIXTURE_DIR, f"page_{page}.html"), encoding="utf-8") as f:
+        return parse_listing(f.read())
+
+
+def test_parse_fixture_listing():
+    rows = fixture_rows(1) + fixture_rows(2) + fixture_rows(3)
+    assert rows and all(list(row) == COLUMNS for row in rows)
+    expected = VESSELS.head(len(rows))
+    assert pd.DataFrame(rows)[COLUMNS].equals(expected[COLUMNS].reset_index(drop=True))
+    assert parse_listing("") == []
+
+
+def test_resume_from_partial_checkpoint(tmp_path):
+    checkpoint_file = str(tmp_path / "scrape.checkpoint.json")
+    store = ScrapeStore(str(tmp_path / "scrape.sqlite"))
+
+    # Första körningen hinner bara sida 1
+    first = Checkpoint(checkpoint_file, LISTING_URL)
+    scrape_pages([1], FixtureFetcher(), store, first, workers=1, rate=0)
+
+    fetcher = RecordingFetcher()
+    resumed = Checkpoint(checkpoint_file, LISTING_URL)
+    counts = scrape_pages(range(1, 4), fetcher, store, resumed, workers=2, rate=0)
+
+    assert counts["skipped"] == 1 and counts["pages"] == 2
+    assert sorted(fetcher.pages) == [2, 3]
+    assert len(store) == sum(len(fixture_rows(page)) for page in (1, 2, 3))
+    store.close()
+
+
+def test_empty_page_is_not_marked_done(tmp_path):
+    store = ScrapeStore(str(tmp_path / "scrape.sqlite"))
+    checkpoint = Checkpoint(str(tmp_path / "scrape.checkpoint.json"), LISTING_URL)
+    # Sida 4 finns inte bland fixturerna -> tom sida
+    counts = scrape_pages([3, 4], FixtureFetcher(), store, checkpoint, rate=0)
+
+    assert counts["failed"] == 1
+    assert checkpoint.is_done(3) and not checkpoint.is_done(4)
+    reloaded = Checkpoint(checkpoint.path, LISTING_URL)
+    assert 4 in reloaded.failed and not reloaded.is_done(4)
+    store.close()
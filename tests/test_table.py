@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+import app
+
+OUTPUT = "..vessel-table.data...vessel-table.page_count...vessel-table.page_current.."
+
+
+def call_table(
+    min_risk=0.0,
+    page=0,
+    sort_by=None,
+    filter_query="",
+    search="",
+    changed="vessel-table.page_current",
+):
+    inputs = {
+        ("risk-slider", "value"): min_risk,
+        ("vessel-table", "page_current"): page,
+        ("vessel-table", "page_size"): 15,
+        ("vessel-table", "sort_by"): sort_by or [],
+        ("vessel-table", "filter_query"): filter_query,
+        ("vessel-search", "value"): search,
+        ("flag-filter", "value"): [],
+        ("type-filter", "value"): [],
+        ("data-version", "data"): app.fleet.version,
+    }
+    spec = app.app.callback_map[OUTPUT]
+    body = {
+        "output": OUTPUT,
+        "outputs": [
+            {"id": "vessel-table", "property": prop}
+            for prop in ("data", "page_count", "page_current")
+        ],
+        "inputs": [
+            {**i, "value": inputs[(i["id"], i["property"])]} for i in spec["inputs"]
+        ],
+        "changedPropIds": [changed],
+    }
+    response = app.server.test_client().post("/_dash-update-component", json=body)
+    assert response.status_code == 200
+    table = json.loads(response.data)["response"]["vessel-table"]
+    return table["data"], table["page_count"], table["page_current"]
+
+
+def expected_imos(min_risk, page, column=None, direction="asc", mask=None):
+    df = app.fleet.df
+    prefix = df.iloc[: app.fleet.prefix_len(min_risk)]
+    if mask is not None:
+        prefix = prefix[mask(prefix)]
+    if column:
+        prefix = prefix.sort_values(
+            column, ascending=direction == "asc", kind="stable", na_position="last"
+        )
+    return prefix["IMO"].iloc[page * 15 : page * 15 + 15].astype(int).tolist()
+
+
+@pytest.mark.parametrize("min_risk", [0.0, 0.3, 0.5])
+@pytest.mark.parametrize("page", [0, 2])
+@pytest.mark.parametrize(
+    "column,direction", [(None, None), ("Age", "desc"), ("GT", "asc")]
+)
+def test_table_pages_match_a_full_sort(min_risk, page, column, direction):
+    sort_by = [{"column_id": column, "direction": direction}] if column else None
+    rows, _, _ = call_table(min_risk, page, sort_by)
+    imos = [int(row["IMO"]) for row in rows]
+    assert imos == expected_imos(min_risk, page, column, direction or "asc")
+
+
+def test_filtered_and_sorted_table():
+    sort_by = [{"column_id": "Age", "direction": "asc"}]
+    rows, _, _ = call_table(0.1, 1, sort_by, "{Age} > 20")
+    imos = [int(row["IMO"]) for row in rows]
+    assert imos == expected_imos(0.1, 1, "Age", "asc", lambda df: df["Age"] > 20)
+
+
+def test_numeric_filter_with_text_value_matches_nothing():
+    rows, page_count, _ = call_table(filter_query="{Age} > abc")
+    assert rows == [] and page_count == 1
+
+
+def test_new_selection_resets_the_page():
+    _, _, page = call_table(0.0, 5, changed="risk-slider.value")
+    assert page == 0
+    _, _, page = call_table(
+        0.0, 5, filter_query="{Age} > 5", changed="vessel-table.filter_query"
+    )
+    assert page == 0
+
+
+def test_page_is_clamped_to_the_selection():
+    rows, page_count, page = call_table(0.5, 10_000)
+    assert page == page_count - 1
+    assert rows